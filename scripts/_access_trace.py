@@ -0,0 +1,102 @@
+
+import asyncio
+import csv
+import itertools
+import time
+import timeit
+
+import numpy as np
+
+from _selections import random_boxes, zipf_chunks
+
+# Access patterns of generate_access_trace
+PATTERNS = ["sequential", "strided", "uniform", "zipf", "viewport"]
+
+# Columns of an access trace CSV: the time of each read from the start of the replay, and its box (e.g. 0:100,0:256,128:228)
+COLUMNS = ["offset_s", "selection"]
+
+def format_selection(selection) -> str:
+    return ",".join(f"{s.start}:{s.stop}" for s in selection)
+
+def parse_selection(text: str) -> tuple[slice, ...]:
+    return tuple(slice(*map(int, bounds.split(":"))) for bounds in text.split(","))
+
+def write_access_trace(path, entries):
+    """Write (offset_s, selection) entries as an access trace CSV."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for offset_s, selection in entries:
+            writer.writerow([f"{offset_s:.6f}", format_selection(selection)])
+
+def read_access_trace(path, shape=None) -> list[tuple[float, tuple[slice, ...]]]:
+    """Read the (offset_s, selection) entries of an access trace CSV, in time order.
+
+    If shape is set, boxes are clipped to it (so a trace can be replayed on a smaller array) and those left empty are dropped.
+    """
+    entries = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            selection = parse_selection(row["selection"])
+            if shape is not None:
+                if len(selection) != len(shape):
+                    raise ValueError(f"Access trace box {row['selection']} does not match an array of shape {list(shape)}")
+                selection = tuple(slice(max(s.start, 0), min(s.stop, size)) for s, size in zip(selection, shape))
+                if any(s.start >= s.stop for s in selection):
+                    continue
+            entries.append((float(row["offset_s"]), selection))
+    return sorted(entries, key=lambda entry: entry[0])
+
+def tile_box(tile_index, shape, box_shape) -> tuple[slice, ...]:
+    return tuple(slice(i * box, min((i + 1) * box, size)) for i, box, size in zip(tile_index, box_shape, shape))
+
+def generate_access_trace(pattern: str, shape, box_shape, count: int, interval_s: float = 0.0, seed: int = 0, skew: float = 1.0, stride: int = 2, step: int | None = None) -> list[tuple[float, tuple[slice, ...]]]:
+    """count reads of boxes of box_shape within shape, interval_s apart.
+
+    sequential reads the box-aligned tiles of the array in C order, strided every stride-th tile and zipf
+    tiles drawn from a Zipf distribution (see zipf_chunks). uniform reads boxes at random unaligned offsets.
+    viewport slides a box by step voxels (default half a box) along the last axis, and by a box along the
+    others at the end of each row, as when panning a viewer. Patterns wrap around if count exceeds the array.
+    """
+    box_shape = [min(box, size) for box, size in zip(box_shape, shape)]
+    grid = [(size + box - 1) // box for size, box in zip(shape, box_shape)]
+    tiles = list(np.ndindex(*grid))
+    if pattern == "sequential":
+        selections = [tile_box(tiles[i % len(tiles)], shape, box_shape) for i in range(count)]
+    elif pattern == "strided":
+        selections = [tile_box(tiles[i * stride % len(tiles)], shape, box_shape) for i in range(count)]
+    elif pattern == "uniform":
+        selections = random_boxes(shape, box_shape, count, seed)
+    elif pattern == "zipf":
+        selections = [tile_box(tile, shape, box_shape) for tile in zipf_chunks(grid, count, skew, seed)]
+    elif pattern == "viewport":
+        step = step or max(box_shape[-1] // 2, 1)
+        starts = [range(0, size - box + 1, box) for size, box in zip(shape[:-1], box_shape[:-1])] + [range(0, shape[-1] - box_shape[-1] + 1, step)]
+        positions = itertools.islice(itertools.cycle(itertools.product(*starts)), count)
+        selections = [tuple(slice(start, start + box) for start, box in zip(position, box_shape)) for position in positions]
+    else:
+        raise ValueError(f"Unsupported access pattern {pattern}")
+    return [(i * interval_s, selection) for i, selection in enumerate(selections)]
+
+def paced(function, realtime: bool = False):
+    """Adapt an async function(selection) to take access trace entries.
+
+    If realtime, each is called no earlier than its offset from when paced was called, else as soon as possible.
+    """
+    start_time = timeit.default_timer()
+    async def call(entry):
+        offset_s, selection = entry
+        if realtime:
+            await asyncio.sleep(start_time + offset_s - timeit.default_timer())
+        return await function(selection)
+    return call
+
+def paced_threads(function, realtime: bool = False):
+    """paced for blocking functions."""
+    start_time = timeit.default_timer()
+    def call(entry):
+        offset_s, selection = entry
+        if realtime:
+            time.sleep(max(start_time + offset_s - timeit.default_timer(), 0.0))
+        return function(selection)
+    return call
@@ -0,0 +1,425 @@
+
+from dataclasses import replace
+
+from _access_trace import PATTERNS as ACCESS_PATTERNS
+from _run_benchmark import Benchmark
+from _scheduler import SCHEDULERS
+from generate_benchmark_array import CODEC_LAYOUTS, SCALING_LAYOUTS, SWEEP_LAYOUTS
+
+IMPLEMENTATIONS = [
+    "zarrs_rust",
+    # "zarrs_rust_async_as_sync",
+    # "zarrs_rust_async",
+    "tensorstore_python",
+    "zarr_python",
+    "zarrs_python",
+    "zarr_dask_python",
+    "zarrs_dask_python",
+    "reference_python",
+]
+
+# The hand-rolled lower-bound reference (whole chunk reads, reads into an array and round trips only)
+REFERENCE_IMPLEMENTATION = "reference_python"
+
+PYTHON_IMPLEMENTATIONS = [implementation for implementation in IMPLEMENTATIONS if implementation.endswith("_python") and implementation != REFERENCE_IMPLEMENTATION]
+
+# Roundtrip only implementations, each following the implementation it is a mode of
+ROUNDTRIP_IMPLEMENTATIONS = {
+    "tensorstore_python": ["tensorstore_python_pipelined"],
+    "zarr_python": ["zarr_python_streaming"],
+    "zarrs_python": ["zarrs_python_streaming"],
+}
+
+READ_SCRIPTS = {
+    "tensorstore_python": "./scripts/tensorstore_python_benchmark_read.py",
+    "zarr_python": "./scripts/zarr_python_benchmark_read.py",
+    "zarrs_python": "./scripts/zarrs_python_benchmark_read.py",
+    "zarr_dask_python": "./scripts/zarr_dask_python_benchmark_read.py",
+    "zarrs_dask_python": "./scripts/zarrs_dask_python_benchmark_read.py",
+    "reference_python": "./scripts/reference_python_benchmark_read.py",
+}
+
+IMAGES = [
+    "data/benchmark.zarr",
+    "data/benchmark_compress.zarr",
+    "data/benchmark_compress_shard.zarr",
+]
+
+# The chunk/shard shape variants written by generate_benchmark_array.py --sweep data/sweep
+SWEEP_IMAGES = [f"data/sweep/{name}" for name in SWEEP_LAYOUTS]
+
+# The sizes written by generate_benchmark_array.py --scaling data/scaling
+SCALING_IMAGES = [f"data/scaling/{name}" for name in SCALING_LAYOUTS]
+
+# The codec variants written by generate_benchmark_array.py --codec_matrix data/codecs
+CODEC_IMAGES = [f"data/codecs/{name}" for name in CODEC_LAYOUTS]
+CODEC_METRICS = {
+    "wall_time_s": "Time (s)",
+    "memory_gb": "Memory (GB)",
+    "throughput_gbps": "Throughput (GB/s)",
+    "compression_ratio": "Compression ratio",
+}
+
+BENCHMARKS = {
+    "read_all": Benchmark(
+        name="read_all",
+        implementation_to_args={
+            "zarrs_rust": ["zarrs_benchmark_read_sync", "--read-all", "{image}"],
+            "zarrs_rust_async_as_sync": ["zarrs_benchmark_read_async_as_sync", "--read-all", "{image}"],
+            "zarrs_rust_async": ["zarrs_benchmark_read_async", "--read-all", "{image}"],
+            "tensorstore_python": ["./scripts/tensorstore_python_benchmark_read.py", "--read_all", "{image}"],
+            "zarr_python": ["./scripts/zarr_python_benchmark_read.py", "--read_all", "{image}"],
+            "zarr_dask_python": ["./scripts/zarr_dask_python_benchmark_read.py", "--read_all", "{image}"],
+            "zarrs_python": ["./scripts/zarrs_python_benchmark_read.py", "--read_all", "{image}"],
+            "zarrs_dask_python": ["./scripts/zarrs_dask_python_benchmark_read.py", "--read_all", "{image}"],
+            "reference_python": ["./scripts/reference_python_benchmark_read.py", "--read_all", "{image}"],
+        },
+        implementations=IMPLEMENTATIONS,
+        images=IMAGES,
+        repetitions=3, # best of 3, as run_benchmark_read_all.py, override with run_benchmark.py --repetitions
+    ),
+    "read_chunks": Benchmark(
+        name="read_chunks",
+        implementation_to_args={
+            "zarrs_rust": ["zarrs_benchmark_read_sync", "--concurrent-chunks", "{concurrency}", "{image}"],
+            "zarrs_rust_async_as_sync": ["zarrs_benchmark_read_async_as_sync", "--concurrent-chunks", "{concurrency}", "{image}"],
+            "zarrs_rust_async": ["zarrs_benchmark_read_async", "--concurrent-chunks", "{concurrency}", "{image}"],
+            "tensorstore_python": ["./scripts/tensorstore_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarr_python": ["./scripts/zarr_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarr_dask_python": ["./scripts/zarr_dask_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarrs_python": ["./scripts/zarrs_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarrs_dask_python": ["./scripts/zarrs_dask_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "reference_python": ["./scripts/reference_python_benchmark_read.py", "--concurrent_chunks", "{concurrency}", "{image}"],
+        },
+        implementations=IMPLEMENTATIONS,
+        images=IMAGES,
+        parameters={"concurrency": [1, 2, 4, 8, 16, 32]},
+        repetitions=1,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "chunk_latency_p50_s": "Chunk latency p50 (s)",
+            "chunk_latency_p90_s": "Chunk latency p90 (s)",
+            "chunk_latency_p99_s": "Chunk latency p99 (s)",
+            "chunk_latency_max_s": "Chunk latency max (s)",
+        },
+    ),
+    "roundtrip": Benchmark(
+        name="roundtrip",
+        implementation_to_args={
+            "zarrs_rust": ["zarrs_reencode", "{image}", "{output}"],
+            "tensorstore_python": ["./scripts/tensorstore_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "zarr_python": ["./scripts/zarr_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "zarr_dask_python": ["./scripts/zarr_dask_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "zarrs_python": ["./scripts/zarrs_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "zarrs_dask_python": ["./scripts/zarrs_dask_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "reference_python": ["./scripts/reference_python_benchmark_roundtrip.py", "{image}", "{output}"],
+            "tensorstore_python_pipelined": ["./scripts/tensorstore_python_benchmark_roundtrip.py", "--pipelined", "{image}", "{output}"],
+            "zarr_python_streaming": ["./scripts/zarr_python_benchmark_roundtrip.py", "--shards_in_flight", "16", "--memory_budget_gb", "1", "{image}", "{output}"],
+            "zarrs_python_streaming": ["./scripts/zarrs_python_benchmark_roundtrip.py", "--shards_in_flight", "16", "--memory_budget_gb", "1", "{image}", "{output}"],
+        },
+        implementations=[
+            mode
+            for implementation in IMPLEMENTATIONS
+            for mode in [implementation] + ROUNDTRIP_IMPLEMENTATIONS.get(implementation, [])
+        ],
+        images=IMAGES,
+        repetitions=3, # best of 3, as run_benchmark_roundtrip.py, override with run_benchmark.py --repetitions
+    ),
+    "startup": Benchmark(
+        name="startup",
+        implementation_to_args={
+            implementation: ["./scripts/python_benchmark_startup.py", implementation, "{image}"]
+            for implementation in PYTHON_IMPLEMENTATIONS
+        },
+        implementations=PYTHON_IMPLEMENTATIONS,
+        images=IMAGES,
+        repetitions=5,
+        metrics={
+            "startup_s": "Start-up (s)",
+            "import_s": "Import (s)",
+            "registration_s": "Registration (s)",
+            "array_open_s": "Open (s)",
+            "wall_time_s": "Time (s)",
+        },
+        floatfmt=".03f",
+    ),
+    "read_roi": Benchmark(
+        name="read_roi",
+        implementation_to_args={
+            implementation: [script, "--roi_shape", "{roi_shape}", "--roi_count", "256", "--concurrent_chunks", "{concurrency}", "{image}"]
+            for implementation, script in READ_SCRIPTS.items()
+        },
+        implementations=PYTHON_IMPLEMENTATIONS,
+        images=IMAGES,
+        parameters={"roi_shape": ["100,100,100"], "concurrency": [1, 4, 16]},
+        repetitions=1,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "throughput_gbps": "Throughput (GB/s)",
+            "latency_p50_s": "Latency p50 (s)",
+            "latency_p99_s": "Latency p99 (s)",
+        },
+        floatfmt=".03f",
+    ),
+    "read_planes": Benchmark(
+        name="read_planes",
+        implementation_to_args={
+            implementation: [script, "--planes", "16", "--plane_axis", "{plane_axis}", "--concurrent_chunks", "1", "{image}"]
+            for implementation, script in READ_SCRIPTS.items()
+        },
+        implementations=PYTHON_IMPLEMENTATIONS,
+        images=IMAGES,
+        parameters={"plane_axis": [0, 1, 2]},
+        repetitions=1,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "selections_per_s": "Planes per second",
+            "decode_amplification": "Decoded bytes per useful byte",
+            "read_amplification": "Read bytes per useful byte",
+        },
+    ),
+    "scheduler": Benchmark(
+        name="scheduler",
+        implementation_to_args={
+            scheduler: ["./scripts/python_benchmark_scheduler.py", scheduler, "--chunks", "{chunks}", "--concurrent_chunks", "{concurrency}"]
+            for scheduler in SCHEDULERS
+        },
+        implementations=list(SCHEDULERS),
+        images=["synthetic"], # the chunk requests are synthetic, there is no image
+        parameters={"chunks": [512, 4096, 32768, 131072, 1048576], "concurrency": [32]},
+        repetitions=3,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "overhead_us_per_chunk": "Overhead per chunk (us)",
+        },
+        cache_eviction="none",
+    ),
+    "read_all_into": Benchmark(
+        name="read_all_into",
+        implementation_to_args={
+            implementation: [script, "--read_all", "--read_into", "{target}", "{image}"]
+            for implementation, script in READ_SCRIPTS.items()
+        },
+        implementations=PYTHON_IMPLEMENTATIONS + [REFERENCE_IMPLEMENTATION],
+        images=IMAGES,
+        parameters={"target": ["numpy", "memmap"]},
+        repetitions=3,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "memory_over_ideal_gb": "Memory over ideal (GB)",
+        },
+    ),
+    "read_inner_chunks": Benchmark(
+        name="read_inner_chunks",
+        implementation_to_args={
+            "tensorstore_python": ["./scripts/tensorstore_python_benchmark_read.py", "--inner_chunks", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarr_python": ["./scripts/zarr_python_benchmark_read.py", "--inner_chunks", "--concurrent_chunks", "{concurrency}", "{image}"],
+            # Caches the encoded shard indexes: saves the index reads, not the decoding of the index
+            "zarr_python_index_cache": ["./scripts/zarr_python_benchmark_read.py", "--inner_chunks", "--cache_shard_index", "--concurrent_chunks", "{concurrency}", "{image}"],
+            "zarrs_python": ["./scripts/zarrs_python_benchmark_read.py", "--inner_chunks", "--concurrent_chunks", "{concurrency}", "{image}"],
+        },
+        implementations=["tensorstore_python", "zarr_python", "zarr_python_index_cache", "zarrs_python"],
+        images=["data/benchmark_compress_shard.zarr"], # inner chunks differ from shards
+        parameters={"concurrency": [8, 32]},
+        repetitions=1,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "chunk_latency_p50_s": "Chunk latency p50 (s)",
+            "chunk_latency_p99_s": "Chunk latency p99 (s)",
+            "shard_index_cache_hits": "Index cache hits",
+            "shard_index_cache_misses": "Index cache misses",
+        },
+        floatfmt=".03f",
+    ),
+}
+
+# read_all, read_chunks and roundtrip on each chunk/shard shape variant
+BENCHMARKS["sweep_read_all"] = replace(BENCHMARKS["read_all"], name="sweep_read_all", images=SWEEP_IMAGES, repetitions=1)
+BENCHMARKS["sweep_read_chunks"] = replace(BENCHMARKS["read_chunks"], name="sweep_read_chunks", images=SWEEP_IMAGES, parameters={"concurrency": [8]})
+BENCHMARKS["sweep_roundtrip"] = replace(BENCHMARKS["roundtrip"], name="sweep_roundtrip", images=SWEEP_IMAGES, repetitions=1)
+
+# Decode (read all) and encode (roundtrip) of each codec variant
+BENCHMARKS["codec_read_all"] = replace(BENCHMARKS["read_all"], name="codec_read_all", images=CODEC_IMAGES, metrics=CODEC_METRICS)
+BENCHMARKS["codec_roundtrip"] = replace(BENCHMARKS["roundtrip"], name="codec_roundtrip", images=CODEC_IMAGES, metrics=CODEC_METRICS)
+
+# Read all and roundtrip against dataset size
+BENCHMARKS["scaling_read_all"] = replace(BENCHMARKS["read_all"], name="scaling_read_all", images=SCALING_IMAGES, repetitions=1)
+BENCHMARKS["scaling_roundtrip"] = replace(BENCHMARKS["roundtrip"], name="scaling_roundtrip", images=SCALING_IMAGES, repetitions=1)
+
+# Full shard, inner chunk, unaligned (region-of-interest) and plane reads of the sharded dataset, with and without
+# merging the byte range reads of a shard separated by at most a gap (0 merges adjacent inner chunks only).
+# Full shard and inner chunk reads are one read each, so they measure the overhead of the wrapper
+COALESCE_SELECTIONS = {
+    "shards": [],
+    "inner_chunks": ["--inner_chunks"],
+    "roi": ["--roi_shape", "100,100,100", "--roi_count", "256"],
+    "planes": ["--planes", "16"],
+}
+COALESCE_GAPS = {"zarr_python": None, "zarr_python_coalesce_gap_0": 0, "zarr_python_coalesce_gap_64k": 65536}
+for selection, args in COALESCE_SELECTIONS.items():
+    BENCHMARKS[f"coalesce_{selection}"] = Benchmark(
+        name=f"coalesce_{selection}",
+        implementation_to_args={
+            implementation: ["./scripts/zarr_python_benchmark_read.py", *args, *([] if gap is None else ["--coalesce_gap_bytes", str(gap)]), "--concurrent_chunks", "{concurrency}", "{image}"]
+            for implementation, gap in COALESCE_GAPS.items()
+        },
+        implementations=list(COALESCE_GAPS),
+        images=["data/benchmark_compress_shard.zarr"],
+        parameters={"concurrency": [32]},
+        repetitions=1,
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "read_syscalls": "Read syscalls",
+            "coalesced_requests": "Range requests",
+            "coalesced_reads": "Range reads",
+            "bytes_over_read": "Bytes over-read",
+        },
+    )
+
+def scaled(benchmark: Benchmark, scale: float) -> Benchmark:
+    """A benchmark on the datasets written by generate_benchmark_array.py --all --scale SCALE data/scale_SCALE."""
+    return replace(
+        benchmark,
+        name=f"{benchmark.name}_scale_{scale:g}",
+        images=[image.replace("data/", f"data/scale_{scale:g}/", 1) for image in benchmark.images],
+    )
+
+def with_access_traces(benchmark: Benchmark, access_traces) -> Benchmark:
+    """A benchmark replaying other access traces (e.g. captured from a service) than the generated ones."""
+    if "access_trace" not in benchmark.parameters:
+        raise ValueError(f"{benchmark.name} does not replay access traces")
+    return replace(benchmark, parameters={**benchmark.parameters, "access_trace": list(access_traces)})
+
+def with_store(benchmark: Benchmark) -> Benchmark:
+    """The Python implementations of a benchmark, on the filesystem and in memory (--store) side by side."""
+    implementations = [implementation for implementation in benchmark.implementations if benchmark.implementation_to_args[implementation][0].startswith("./scripts/")]
+    return replace(
+        benchmark,
+        name=f"store_{benchmark.name}",
+        implementation_to_args={
+            implementation: [benchmark.implementation_to_args[implementation][0], "--store", "{store}", *benchmark.implementation_to_args[implementation][1:]]
+            for implementation in implementations
+        },
+        implementations=implementations,
+        parameters={"store": ["local", "memory"], **benchmark.parameters},
+    )
+
+# Read all, chunk-by-chunk and roundtrip from the filesystem and from memory
+for name in ["read_all", "read_chunks", "roundtrip"]:
+    BENCHMARKS[f"store_{name}"] = with_store(BENCHMARKS[name])
+
+def with_flag(benchmark: Benchmark, flag: str, suffix: str, implementations: list[str], **changes) -> Benchmark:
+    """A benchmark of implementations with and without flag side by side, as {implementation} and {implementation}_{suffix}."""
+    implementation_to_args = {}
+    for implementation in implementations:
+        args = benchmark.implementation_to_args[implementation]
+        implementation_to_args[implementation] = args
+        implementation_to_args[f"{implementation}_{suffix}"] = [args[0], flag, *args[1:]]
+    changes = {"name": f"{suffix}_{benchmark.name}", **changes}
+    return replace(
+        benchmark,
+        implementation_to_args=implementation_to_args,
+        implementations=list(implementation_to_args),
+        **changes,
+    )
+
+# Python implementations reading through memory-mapped files, rather than reading files into buffers
+MMAP_IMPLEMENTATIONS = ["zarr_python", "zarr_dask_python", "reference_python"]
+
+def with_mmap(benchmark: Benchmark) -> Benchmark:
+    """A benchmark of MMAP_IMPLEMENTATIONS on the uncompressed dataset, with and without --mmap side by side."""
+    return with_flag(
+        benchmark, "--mmap", "mmap", MMAP_IMPLEMENTATIONS,
+        images=["data/benchmark.zarr"],
+        metrics={**benchmark.metrics, "memory_over_ideal_gb": "Memory over ideal (GB)"} if benchmark.name == "read_all" else benchmark.metrics,
+    )
+
+# Read all and chunk-by-chunk of uncompressed chunks copied once (from the page cache) or twice
+BENCHMARKS["mmap_read_all"] = with_mmap(BENCHMARKS["read_all"])
+BENCHMARKS["mmap_read_chunks"] = replace(with_mmap(BENCHMARKS["read_chunks"]), parameters={"concurrency": [1, 8]})
+
+# Read all and chunk-by-chunk through the page cache (cold) and bypassing it with O_DIRECT (--direct_io)
+BENCHMARKS["direct_read_all"] = with_flag(BENCHMARKS["read_all"], "--direct_io", "direct", [REFERENCE_IMPLEMENTATION])
+BENCHMARKS["direct_read_chunks"] = with_flag(BENCHMARKS["read_chunks"], "--direct_io", "direct", [REFERENCE_IMPLEMENTATION], parameters={"concurrency": [1, 8, 32]})
+
+# Byte budgets of the decoded chunk caches: the cache_pool total_bytes_limit of tensorstore, or the LRU cache wrapping the zarr-python codec pipeline
+CACHE_BYTES = [0, 1_000_000_000, 4_000_000_000, 16_000_000_000]
+CACHE_IMPLEMENTATIONS = ["tensorstore_python", "zarr_python", "zarrs_python"]
+
+# The same boxes read in 4 passes in one process, with the page cache kept or evicted before each pass
+BENCHMARKS["warm_read"] = with_flag(
+    Benchmark(
+        name="warm_read",
+        implementation_to_args={
+            implementation: [READ_SCRIPTS[implementation], "--roi_shape", "100,100,100", "--roi_count", "64", "--concurrent_chunks", "16", "--passes", "4", "--cache_bytes", "{cache_bytes}", "{image}"]
+            for implementation in CACHE_IMPLEMENTATIONS
+        },
+        implementations=CACHE_IMPLEMENTATIONS,
+        images=IMAGES,
+        parameters={"cache_bytes": CACHE_BYTES},
+        metrics={
+            "first_pass_s": "First pass (s)",
+            "warm_pass_s": "Warm pass (s)",
+            "memory_gb": "Memory (GB)",
+            "cache_hits": "Cache hits",
+            "cache_entry_mb": "Cache entry (MB)",
+        },
+        floatfmt=".03f",
+    ),
+    "--evict_between_passes", "evict", CACHE_IMPLEMENTATIONS,
+    name="warm_read",
+)
+
+# Chunks drawn from a Zipf distribution of popularity (--zipf_skew), without and with a 2GB decoded chunk cache
+BENCHMARKS["zipf_read"] = with_flag(
+    Benchmark(
+        name="zipf_read",
+        implementation_to_args={
+            implementation: [READ_SCRIPTS[implementation], "--zipf_accesses", "512", "--zipf_skew", "{skew}", "--concurrent_chunks", "8", "{image}"]
+            for implementation in CACHE_IMPLEMENTATIONS
+        },
+        implementations=CACHE_IMPLEMENTATIONS,
+        images=IMAGES,
+        parameters={"skew": [0.5, 1.0, 1.5]},
+        metrics={
+            "wall_time_s": "Time (s)",
+            "memory_gb": "Memory (GB)",
+            "throughput_gbps": "Throughput (GB/s)",
+            "cache_hit_rate": "Cache hit rate",
+            "decodes_avoided": "Decodes avoided",
+            "cache_entry_mb": "Cache entry (MB)",
+        },
+    ),
+    "--cache_bytes=2000000000", "cache", CACHE_IMPLEMENTATIONS,
+    name="zipf_read",
+)
+
+# The access traces written by generate_access_trace.py --all data/traces
+ACCESS_TRACES = [f"data/traces/{pattern}.csv" for pattern in ACCESS_PATTERNS]
+
+BENCHMARKS["trace_read"] = Benchmark(
+    name="trace_read",
+    implementation_to_args={
+        implementation: [script, "--access_trace", "{access_trace}", "--concurrent_chunks", "{concurrency}", "{image}"]
+        for implementation, script in READ_SCRIPTS.items()
+    },
+    implementations=PYTHON_IMPLEMENTATIONS + [REFERENCE_IMPLEMENTATION],
+    images=IMAGES,
+    parameters={"access_trace": ACCESS_TRACES, "concurrency": [4]},
+    metrics={
+        "wall_time_s": "Time (s)",
+        "memory_gb": "Memory (GB)",
+        "throughput_gbps": "Throughput (GB/s)",
+        "latency_p50_s": "Latency p50 (s)",
+        "latency_p99_s": "Latency p99 (s)",
+        "decode_amplification": "Decoded bytes per useful byte",
+    },
+    floatfmt=".03f",
+)
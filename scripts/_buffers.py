@@ -0,0 +1,21 @@
+
+import tempfile
+
+import numpy as np
+
+# Preallocated output buffer targets of --read_into
+TARGETS = ["numpy", "memmap"]
+
+def allocate(shape, dtype, target: str) -> np.ndarray:
+    """An uninitialised output array, in anonymous memory (numpy) or mapped from a temporary file (memmap).
+
+    Pages are only committed as they are written, so peak memory usage reflects the copies made while reading.
+    """
+    if target == "numpy":
+        return np.empty(shape, dtype=dtype)
+    elif target == "memmap":
+        # The file is unlinked on creation, its mapping keeps it alive
+        with tempfile.TemporaryFile() as f:
+            return np.memmap(f, dtype=dtype, mode="w+", shape=tuple(shape))
+    else:
+        raise ValueError(f"Unsupported target {target}")
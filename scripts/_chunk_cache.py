@@ -0,0 +1,121 @@
+
+import asyncio
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class LRUCache:
+    """A least recently used cache with a byte budget, counting hits, misses and evictions. Thread-safe.
+
+    Values larger than the budget are not cached.
+    """
+
+    def __init__(self, nbytes_limit: int):
+        self.nbytes_limit = nbytes_limit
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.nbytes_limit:
+                return
+            while self.nbytes + nbytes > self.nbytes_limit:
+                _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_nbytes
+                self.evictions += 1
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+
+class CachingCodecPipeline:
+    """Wraps the codec pipeline of a zarr-python array (default or zarrs) with an LRU cache of decoded chunks.
+
+    Entries are whole decoded chunks (shards, if sharded) keyed by their store path. A miss decodes the
+    whole chunk with the wrapped pipeline before copying the selection out, and concurrent misses of a
+    chunk wait for the same decode. Hits are only copied.
+    Everything but read is delegated to the wrapped pipeline.
+    """
+
+    def __init__(self, pipeline, cache: LRUCache):
+        self.pipeline = pipeline
+        self.cache = cache
+        self.decodes = 0
+        self.bytes_decoded = 0
+        self._decoding = {}
+
+    @classmethod
+    def wrap(cls, array, nbytes_limit: int) -> "CachingCodecPipeline":
+        """Cache the decoded chunks of a zarr.Array (or AsyncArray), returning the caching pipeline."""
+        async_array = getattr(array, "_async_array", array)
+        pipeline = cls(async_array.codec_pipeline, LRUCache(nbytes_limit))
+        # Arrays are frozen dataclasses
+        object.__setattr__(async_array, "codec_pipeline", pipeline)
+        return pipeline
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+    def stats(self) -> dict:
+        """Cache hits, misses and evictions, the decodes made and avoided (by hits or waiting for a decode), and the mean entry size.
+
+        Entries are whole shards of sharded arrays, so a miss decodes (and an entry holds) every inner chunk of a
+        shard, where the cache_pool of tensorstore holds inner chunks. cache_entry_mb makes this comparable.
+        """
+        requests = self.cache.hits + self.cache.misses
+        return {
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_evictions": self.cache.evictions,
+            "cache_hit_rate": self.cache.hits / requests if requests else None,
+            "decodes": self.decodes,
+            "decodes_avoided": requests - self.decodes,
+            "cache_entry_mb": self.bytes_decoded / self.decodes / 1.0e6 if self.decodes else None,
+        }
+
+    async def decode_chunk(self, byte_getter, chunk_spec) -> np.ndarray:
+        out = chunk_spec.prototype.nd_buffer.create(shape=chunk_spec.shape, dtype=chunk_spec.dtype, order=chunk_spec.order, fill_value=chunk_spec.fill_value)
+        whole_chunk = tuple(slice(0, size) for size in chunk_spec.shape)
+        await self.pipeline.read([(byte_getter, chunk_spec, whole_chunk, whole_chunk, True)], out)
+        self.decodes += 1
+        chunk = out.as_numpy_array()
+        self.bytes_decoded += chunk.nbytes
+        self.cache.put(byte_getter.path, chunk, chunk.nbytes)
+        return chunk
+
+    async def read_chunk(self, byte_getter, chunk_spec) -> np.ndarray:
+        key = byte_getter.path
+        chunk = self.cache.get(key)
+        if chunk is not None:
+            return chunk
+        decoding = self._decoding.get(key)
+        if decoding is None:
+            decoding = self._decoding[key] = asyncio.ensure_future(self.decode_chunk(byte_getter, chunk_spec))
+            decoding.add_done_callback(lambda _: self._decoding.pop(key, None))
+        # A cancelled read does not cancel the decode others are waiting for
+        return await asyncio.shield(decoding)
+
+    async def read(self, batch_info, out, drop_axes: tuple[int, ...] = ()) -> None:
+        batch_info = list(batch_info)
+        chunks = await asyncio.gather(*(self.read_chunk(byte_getter, chunk_spec) for byte_getter, chunk_spec, *_ in batch_info))
+        out = out.as_ndarray_like()
+        for chunk, (_, _, chunk_selection, out_selection, _) in zip(chunks, batch_info):
+            value = chunk[chunk_selection]
+            if drop_axes:
+                value = value.squeeze(axis=drop_axes)
+            out[out_selection] = value
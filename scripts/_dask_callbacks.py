@@ -0,0 +1,22 @@
+
+import timeit
+
+import numpy as np
+from dask.callbacks import Callback
+
+from _telemetry import Telemetry
+
+class ChunkLatencyCallback(Callback):
+    """Records the latency of each task loading a chunk, from when the scheduler starts it until it finishes."""
+
+    def __init__(self, telemetry: Telemetry):
+        super().__init__()
+        self._telemetry = telemetry
+        self._start_times = {}
+
+    def _pretask(self, key, dsk, state):
+        self._start_times[key] = timeit.default_timer()
+
+    def _posttask(self, key, result, dsk, state, id):
+        if isinstance(result, np.ndarray):
+            self._telemetry.chunk_read(result.nbytes, timeit.default_timer() - self._start_times.pop(key))
@@ -0,0 +1,279 @@
+
+import errno
+import itertools
+import math
+import mmap
+import os
+
+import numcodecs
+import numpy as np
+from numcodecs.checksum32 import CRC32C
+
+from _shard_index import MISSING, array_metadata, chunk_key, chunk_layout, chunks_per_shard, parse_shard_index, shard_index_nbytes
+from _stores import store_files
+
+BLOSC_SHUFFLE = {"noshuffle": 0, "shuffle": 1, "bitshuffle": 2}
+
+# The chunk codecs supported, in the order of a codec chain: array-to-array, array-to-bytes then bytes-to-bytes
+ARRAY_CODECS = ["transpose"]
+SERIALIZERS = ["bytes"]
+BYTES_CODECS = ["blosc", "zstd", "gzip", "crc32c"]
+
+class LocalFiles:
+    """The files of a filesystem store, read and written whole."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with open(os.path.join(self.path, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes):
+        path = os.path.join(self.path, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(value)
+
+class MmapFiles(LocalFiles):
+    """The files of a filesystem store, memory-mapped rather than read, so uncompressed chunks are copied once."""
+
+    def get(self, key: str) -> memoryview | bytes | None:
+        try:
+            with open(os.path.join(self.path, key), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return None
+        if hasattr(mmap, "MADV_WILLNEED"):
+            mapped.madvise(mmap.MADV_WILLNEED)
+        return memoryview(mapped)
+
+class DirectFiles(LocalFiles):
+    """The files of a filesystem store read with O_DIRECT (Linux), bypassing the page cache, and written as LocalFiles.
+
+    O_DIRECT reads whole blocks into aligned memory, so each file is read into an anonymous (page aligned)
+    mapping rounded up to a multiple of alignment bytes.
+    """
+
+    def __init__(self, path, alignment=4096):
+        super().__init__(path)
+        if not hasattr(os, "O_DIRECT"):
+            raise Exception("Unsupported platform")
+        self.alignment = alignment
+
+    def get(self, key: str) -> memoryview | bytes | None:
+        path = os.path.join(self.path, key)
+        try:
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECT)
+            try:
+                size = os.fstat(fd).st_size
+                if size == 0:
+                    return b""
+                buffer = memoryview(mmap.mmap(-1, size + -size % self.alignment))
+                offset = 0
+                while offset < size:
+                    nbytes = os.preadv(fd, [buffer[offset:]], offset)
+                    if nbytes == 0:
+                        break
+                    offset += nbytes
+            finally:
+                os.close(fd)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            if e.errno != errno.EINVAL:
+                raise
+            raise OSError(e.errno, f"O_DIRECT reads are not supported by the filesystem of {path}") from e
+        return buffer[:size]
+
+class MemoryFiles:
+    """The files of a store held in memory, optionally copied from the filesystem store at path."""
+
+    def __init__(self, path=None):
+        self.files = {}
+        if path is not None:
+            for key, file_path in store_files(path):
+                with open(file_path, "rb") as f:
+                    self.files[key] = f.read()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(value) for value in self.files.values())
+
+    def get(self, key: str) -> bytes | None:
+        return self.files.get(key)
+
+    def set(self, key: str, value: bytes):
+        self.files[key] = value
+
+def validate_codecs(codecs: list[dict]):
+    """Raise a ValueError naming the first codec of a chunk codec chain that is unsupported (or out of order)."""
+    names = [codec["name"] for codec in codecs]
+    expected = ARRAY_CODECS + SERIALIZERS
+    for name in names:
+        if name not in expected:
+            raise ValueError(f"Unsupported codec {name} in the codec chain {names}, the reference implementation supports {ARRAY_CODECS} then {SERIALIZERS} then {BYTES_CODECS}")
+        if name in SERIALIZERS:
+            expected = BYTES_CODECS
+    if expected is not BYTES_CODECS:
+        raise ValueError(f"The codec chain {names} has no {SERIALIZERS} codec")
+
+def bytes_codec(codec: dict):
+    """The numcodecs equivalent of a Zarr V3 bytes-to-bytes codec."""
+    name, configuration = codec["name"], codec.get("configuration", {})
+    if name == "blosc":
+        return numcodecs.Blosc(cname=configuration["cname"], clevel=configuration["clevel"], shuffle=BLOSC_SHUFFLE[configuration["shuffle"]], blocksize=configuration.get("blocksize", 0))
+    elif name == "zstd":
+        return numcodecs.Zstd(level=configuration.get("level", 0), checksum=configuration.get("checksum", False))
+    elif name == "gzip":
+        return numcodecs.GZip(level=configuration.get("level", 6))
+    elif name == "crc32c":
+        return CRC32C(location="end")
+    else:
+        raise ValueError(f"Unsupported codec {name}")
+
+class ChunkCodecs:
+    """The codec chain of a chunk: transposes, then bytes, then bytes-to-bytes codecs (compressors and checksums)."""
+
+    def __init__(self, codecs: list[dict], chunk_shape, dtype):
+        validate_codecs(codecs)
+        self.orders = [codec["configuration"]["order"] for codec in codecs if codec["name"] == "transpose"]
+        serializer = next(codec for codec in codecs if codec["name"] == "bytes")
+        endian = serializer.get("configuration", {}).get("endian", "little")
+        self.dtype = np.dtype(dtype).newbyteorder("<" if endian == "little" else ">")
+        self.compressors = [bytes_codec(codec) for codec in codecs[codecs.index(serializer) + 1:]]
+        self.chunk_shape = list(chunk_shape)
+        self.encoded_shape = list(chunk_shape)
+        for order in self.orders:
+            self.encoded_shape = [self.encoded_shape[axis] for axis in order]
+
+    def decode(self, data: bytes) -> np.ndarray:
+        for compressor in reversed(self.compressors):
+            data = compressor.decode(data)
+        array = np.frombuffer(data, dtype=self.dtype).reshape(self.encoded_shape)
+        for order in reversed(self.orders):
+            array = array.transpose(np.argsort(order))
+        return array
+
+    def encode(self, array: np.ndarray) -> bytes:
+        for order in self.orders:
+            array = array.transpose(order)
+        # Compressors see the typed array, so blosc shuffles elements of its size
+        data = np.ascontiguousarray(array, dtype=self.dtype)
+        for compressor in self.compressors:
+            data = compressor.encode(data)
+        return bytes(data)
+
+class ReferenceArray:
+    """A minimal Zarr V3 array reader and writer: whole chunk (or shard) files, decoded with numcodecs.
+
+    Read and write the chunks of the chunk grid (the shards, if sharded) from a pool of threads, such that
+    each call is independent and releases the GIL while decoding.
+    """
+
+    def __init__(self, files, metadata: dict):
+        self.files = files
+        self.metadata = metadata
+        self.layout = chunk_layout(metadata)
+        self.shape = metadata["shape"]
+        self.dtype = np.dtype(metadata["data_type"])
+        self.fill_value = metadata["fill_value"]
+        self.shard_shape = self.layout["shard_shape"]
+        self.chunk_shape = self.layout["chunk_shape"]
+        self.codecs = ChunkCodecs(self.layout["codecs"], self.chunk_shape, self.dtype)
+        self.grid = [(size + shard - 1) // shard for size, shard in zip(self.shape, self.shard_shape)]
+
+    @classmethod
+    def open(cls, files, path):
+        return cls(files, array_metadata(path))
+
+    @property
+    def sharded(self) -> bool:
+        return self.layout["index_location"] is not None
+
+    @property
+    def nbytes(self) -> int:
+        return math.prod(self.shape) * self.dtype.itemsize
+
+    def shard_selection(self, shard_index) -> tuple[slice, ...]:
+        """The region of a shard (or chunk) within the array."""
+        return tuple(slice(i * s, min((i + 1) * s, size)) for i, s, size in zip(shard_index, self.shard_shape, self.shape))
+
+    def shard_indices(self):
+        return np.ndindex(*self.grid)
+
+    def read_shard(self, shard_index, out: np.ndarray | None = None) -> np.ndarray:
+        """Decode a shard (or chunk) into out, the shard region of the array."""
+        if out is None:
+            out = np.empty([s.stop - s.start for s in self.shard_selection(shard_index)], dtype=self.dtype)
+        data = self.files.get(chunk_key(self.metadata, shard_index))
+        if data is None:
+            out[...] = self.fill_value
+        elif not self.sharded:
+            out[...] = self.codecs.decode(data)[tuple(slice(0, s) for s in out.shape)]
+        else:
+            nbytes = shard_index_nbytes(self.layout)
+            index = data[-nbytes:] if self.layout["index_location"] == "end" else data[:nbytes]
+            index = parse_shard_index(index, self.layout)
+            data = memoryview(data)
+            for chunk_index in np.ndindex(*chunks_per_shard(self.layout)):
+                selection = tuple(slice(i * c, min((i + 1) * c, size)) for i, c, size in zip(chunk_index, self.chunk_shape, out.shape))
+                if any(s.start >= s.stop for s in selection):
+                    continue
+                offset, chunk_nbytes = index[chunk_index]
+                if offset == MISSING:
+                    out[selection] = self.fill_value
+                else:
+                    chunk = self.codecs.decode(data[offset:offset + chunk_nbytes])
+                    out[selection] = chunk[tuple(slice(0, s.stop - s.start) for s in selection)]
+        return out
+
+    def read_selection(self, selection) -> np.ndarray:
+        """Decode a box (a tuple of slices) of the array from the shards (or chunks) it intersects."""
+        out = np.empty([s.stop - s.start for s in selection], dtype=self.dtype)
+        shard_ranges = [range(s.start // shard, (s.stop - 1) // shard + 1) for s, shard in zip(selection, self.shard_shape)]
+        for shard_index in itertools.product(*shard_ranges):
+            shard_selection = self.shard_selection(shard_index)
+            overlap = [slice(max(s.start, shard.start), min(s.stop, shard.stop)) for s, shard in zip(selection, shard_selection)]
+            out_box = tuple(slice(o.start - s.start, o.stop - s.start) for o, s in zip(overlap, selection))
+            shard_box = tuple(slice(o.start - s.start, o.stop - s.start) for o, s in zip(overlap, shard_selection))
+            out[out_box] = self.read_shard(shard_index)[shard_box]
+        return out
+
+    def read_into(self, shard_index, out: np.ndarray) -> int:
+        """Decode a shard (or chunk) into its region of out, an array the shape of the whole array."""
+        return self.read_shard(shard_index, out[self.shard_selection(shard_index)]).nbytes
+
+    def write_shard(self, shard_index, data: np.ndarray):
+        """Encode the shard (or chunk) region data of the array, padding edge chunks with the fill value."""
+        if not self.sharded:
+            self.files.set(chunk_key(self.metadata, shard_index), self.codecs.encode(self.pad(data, self.chunk_shape)))
+            return
+        chunks = []
+        index = np.empty(chunks_per_shard(self.layout) + [2], dtype="<u8")
+        offset = shard_index_nbytes(self.layout) if self.layout["index_location"] == "start" else 0
+        for chunk_index in np.ndindex(*chunks_per_shard(self.layout)):
+            selection = tuple(slice(i * c, min((i + 1) * c, size)) for i, c, size in zip(chunk_index, self.chunk_shape, data.shape))
+            if any(s.start >= s.stop for s in selection):
+                index[chunk_index] = MISSING
+                continue
+            chunk = self.codecs.encode(self.pad(data[selection], self.chunk_shape))
+            index[chunk_index] = (offset, len(chunk))
+            offset += len(chunk)
+            chunks.append(chunk)
+        index = index.tobytes()
+        if self.layout["index_checksum"]:
+            index = bytes(CRC32C(location="end").encode(index))
+        self.files.set(chunk_key(self.metadata, shard_index), b"".join([*chunks, index] if self.layout["index_location"] == "end" else [index, *chunks]))
+
+    def pad(self, data: np.ndarray, shape) -> np.ndarray:
+        if list(data.shape) == list(shape):
+            return data
+        padded = np.full(shape, self.fill_value, dtype=self.dtype)
+        padded[tuple(slice(0, s) for s in data.shape)] = data
+        return padded
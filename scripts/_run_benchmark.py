@@ -1,6 +1,35 @@
 
+import itertools
+import math
+import os
 import platform
+import re
 import subprocess
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import _trace
+from _stores import evict_files
+from _telemetry import parse_telemetry
+
+RUNS_CSV = "measurements/benchmark_runs.csv"
+TRACES_DIR = "measurements/traces"
+LATENCIES_DIR = "measurements/latencies"
+
+# Long format result columns identifying a run, together with the parameters of the benchmark
+KEY_COLUMNS = ["benchmark", "image", "implementation", "repetition"]
+
+# Default measured columns and their labels in the summary tables
+METRICS = {
+    "wall_time_s": "Time (s)",
+    "memory_gb": "Memory (GB)",
+}
+
+# Methods of evicting the dataset of a run from the page cache before it (--cache_eviction)
+CACHE_EVICTION = ["drop_caches", "fadvise", "none"]
 
 def clear_cache():
     if platform.system() == "Darwin":
@@ -10,6 +39,22 @@ def clear_cache():
     else:
         raise Exception("Unsupported platform")
 
+def evict_cache(image: str, cache_eviction: str = "drop_caches"):
+    """Evict image from the page cache: drop the caches of the whole system (needs sudo), evict only its files, or do nothing.
+
+    http images are not cached locally and are not evicted.
+    """
+    if cache_eviction not in CACHE_EVICTION:
+        raise ValueError(f"Unsupported cache eviction {cache_eviction}")
+    if cache_eviction == "none" or image.startswith(("http://", "https://")):
+        return
+    if not os.path.exists(image):
+        raise FileNotFoundError(f"Image {image} does not exist, it cannot be evicted from the page cache")
+    if cache_eviction == "drop_caches":
+        clear_cache()
+    elif cache_eviction == "fadvise":
+        evict_files(image)
+
 def time_args():
     if platform.system() == "Darwin":
         return ["gtime", "-v"]
@@ -17,3 +62,238 @@ def time_args():
         return ["time", "-v"]
     else:
         raise Exception("Unsupported platform")
+
+@dataclass
+class Benchmark:
+    """A benchmark matrix: images x parameters x implementations x repetitions.
+
+    Implementation arguments are templates formatted with the image, the parameters and,
+    if used, an "{output}" temporary directory.
+    """
+    name: str
+    implementation_to_args: dict[str, list[str]]
+    implementations: list[str]
+    images: list[str]
+    parameters: dict[str, list] = field(default_factory=dict)
+    repetitions: int = 1
+    metrics: dict[str, str] = field(default_factory=lambda: dict(METRICS))
+    floatfmt: str = ".02f"
+    # Overrides --cache_eviction, e.g. "none" for benchmarks without an image on disk
+    cache_eviction: str | None = None
+
+    @property
+    def summary_path(self) -> str:
+        return f"measurements/benchmark_{self.name}"
+
+    def cells(self, implementations=None, images=None, parameters=None):
+        """Yield (image, parameters, implementation) cells, optionally filtered.
+
+        parameters maps a parameter name to the list of values to keep.
+        """
+        parameters = parameters or {}
+        parameter_values = [
+            [value for value in values if name not in parameters or str(value) in map(str, parameters[name])]
+            for name, values in self.parameters.items()
+        ]
+        for image in self.images:
+            if images and image not in images:
+                continue
+            for values in itertools.product(*parameter_values):
+                for implementation in self.implementations:
+                    if implementations and implementation not in implementations:
+                        continue
+                    yield image, dict(zip(self.parameters, values)), implementation
+
+def parameter_label(name: str) -> str:
+    return name.replace("_", " ").capitalize()
+
+def run_command(args, trace_interval=None) -> tuple[dict, pd.DataFrame | None]:
+    """Run a command under `time -v`, returning its wall time, peak memory usage and telemetry record.
+
+    If trace_interval (s) is set, the command is also sampled from /proc and its trace is returned.
+    """
+    pipes = subprocess.Popen(time_args() + args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    sampler = None
+    if trace_interval and _trace.supported():
+        sampler = _trace.ProcessSampler(pipes.pid, trace_interval)
+        sampler.start()
+    std_out, std_err = pipes.communicate()
+    trace = sampler.stop() if sampler else None
+    # print(std_err)
+
+    wall_time = re.search(
+        r"Elapsed \(wall clock\) time \(h:mm:ss or m:ss\): (\d+?):([\d\.]+?)\\n",
+        str(std_err),
+    )
+    memory_usage = re.search(
+        r"Maximum resident set size \(kbytes\): (\d+?)\\n", str(std_err)
+    )
+    if wall_time and memory_usage and pipes.returncode == 0:
+        m = int(wall_time.group(1))
+        s = float(wall_time.group(2))
+        wall_time_s = m * 60 + s
+        memory_usage_kb = int(memory_usage.group(1))
+        memory_usage_gb = float(memory_usage_kb) / 1.0e6
+        metrics = {"wall_time_s": wall_time_s, "memory_gb": memory_usage_gb}
+    else:
+        return {"wall_time_s": math.nan, "memory_gb": math.nan}, trace
+
+    # Throughput and fixed overhead (start-up, imports, open) from the telemetry of the Python scripts
+    telemetry = parse_telemetry(std_out.decode())
+    metrics.update(telemetry)
+    if telemetry.get("elapsed_s"):
+        metrics["throughput_gbps"] = telemetry["bytes_decoded"] / telemetry["elapsed_s"] / 1.0e9
+        metrics["overhead_s"] = wall_time_s - telemetry["elapsed_s"]
+        if telemetry.get("selections"):
+            metrics["selections_per_s"] = telemetry["selections"] / telemetry["elapsed_s"]
+    if telemetry.get("ideal_memory_gb"):
+        # Peak memory usage beyond holding the decoded array once
+        metrics["memory_over_ideal_gb"] = metrics["memory_gb"] - telemetry["ideal_memory_gb"]
+    if telemetry.get("bytes_decoded"):
+        # Bytes read from storage and decoded (whole chunks) per useful (selected) byte
+        metrics["read_amplification"] = telemetry["bytes_read"] / telemetry["bytes_decoded"] if telemetry.get("bytes_read") is not None else math.nan
+        metrics["decode_amplification"] = telemetry.get("chunk_bytes_decoded", telemetry["bytes_decoded"]) / telemetry["bytes_decoded"]
+    if telemetry.get("bytes_decoded") and telemetry.get("bytes_read"):
+        # The compression ratio if everything read is decoded once
+        metrics["compression_ratio"] = telemetry["bytes_decoded"] / telemetry["bytes_read"]
+    return metrics, trace
+
+def path_label(value) -> str:
+    """A file name part for a parameter value, the name (without extension) of path values (e.g. access traces)."""
+    value = str(value)
+    return os.path.splitext(os.path.basename(value))[0] if os.sep in value or "/" in value else value
+
+def trace_path(benchmark: Benchmark, image: str, parameters: dict, implementation: str, repetition: int, directory=TRACES_DIR) -> str:
+    name = "_".join(
+        [path_label(image)]
+        + [f"{name}-{path_label(value)}" for name, value in parameters.items()]
+        + [str(repetition)]
+    )
+    return os.path.join(directory, benchmark.name, implementation, f"{name}.csv.gz")
+
+def run_cell(benchmark: Benchmark, image: str, parameters: dict, implementation: str, repetition: int, trace_interval=None, cache_eviction="drop_caches") -> dict:
+    output = tempfile.TemporaryDirectory()
+    args = [
+        arg.format(image=image, output=output.name, **parameters)
+        for arg in benchmark.implementation_to_args[implementation]
+    ]
+    evict_cache(image, benchmark.cache_eviction or cache_eviction)
+    metrics, trace = run_command(args, trace_interval)
+    output.cleanup()
+
+    if trace is not None:
+        path = trace_path(benchmark, image, parameters, implementation, repetition)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        trace.to_csv(path, index=False)
+        metrics["trace"] = path
+
+    chunk_latencies_s = metrics.pop("chunk_latencies_s", None)
+    if chunk_latencies_s:
+        path = trace_path(benchmark, image, parameters, implementation, repetition, LATENCIES_DIR)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pd.DataFrame({"latency_s": chunk_latencies_s}).to_csv(path, index=False)
+        metrics["chunk_latencies"] = path
+
+    return {
+        "benchmark": benchmark.name,
+        "image": image,
+        **parameters,
+        "implementation": implementation,
+        "repetition": repetition,
+        **metrics,
+    }
+
+def load_runs(path=RUNS_CSV) -> pd.DataFrame:
+    """Load the long format table, cells are identified by their string representation."""
+    if os.path.exists(path):
+        return pd.read_csv(path, dtype=str, keep_default_na=False)
+    return pd.DataFrame(columns=KEY_COLUMNS)
+
+def save_runs(benchmark: Benchmark, runs: pd.DataFrame, new_runs: pd.DataFrame, path=RUNS_CSV) -> pd.DataFrame:
+    """Insert new runs into the long format table, replacing earlier runs of the same cells."""
+    keys = KEY_COLUMNS + list(benchmark.parameters)
+    new_runs = new_runs.astype({key: str for key in keys})
+    replaced = runs.reindex(columns=keys).apply(tuple, axis=1).isin(new_runs[keys].apply(tuple, axis=1))
+    runs = pd.concat([runs[~replaced], new_runs], ignore_index=True)
+    runs.to_csv(path, index=False)
+    return load_runs(path)
+
+def run_benchmark(benchmark: Benchmark, implementations=None, images=None, parameters=None, repetitions=None, dry_run=False, trace_interval=0.01, cache_eviction="drop_caches"):
+    repetitions = benchmark.repetitions if repetitions is None else repetitions
+    new_runs = []
+    for image, cell_parameters, implementation in benchmark.cells(implementations, images, parameters):
+        for repetition in range(repetitions):
+            print(benchmark.name, implementation, image, *cell_parameters.values(), repetition)
+            if dry_run:
+                continue
+            run = run_cell(benchmark, image, cell_parameters, implementation, repetition, trace_interval, cache_eviction)
+            print(run["wall_time_s"], run["memory_gb"])
+            new_runs.append(run)
+
+    if new_runs:
+        runs = save_runs(benchmark, load_runs(), pd.DataFrame(new_runs))
+        summarise(benchmark, runs)
+
+def summarise(benchmark: Benchmark, runs: pd.DataFrame):
+    """Write the best-of summary tables of a benchmark if every cell of its matrix has been run."""
+    runs = runs[runs["benchmark"] == benchmark.name]
+    index = []
+    rows = []
+    for (image, parameter_values), cells in itertools.groupby(benchmark.cells(), key=lambda cell: (cell[0], tuple(cell[1].values()))):
+        row = {metric: [] for metric in benchmark.metrics}
+        for _, cell_parameters, implementation in cells:
+            cell = (runs["image"] == image) & (runs["implementation"] == implementation)
+            for name, value in cell_parameters.items():
+                cell &= runs.reindex(columns=[name])[name] == str(value)
+            if not cell.any():
+                print(f"Not writing {benchmark.summary_path} summary, {implementation} {image} {cell_parameters} has not been run")
+                return
+            for metric in benchmark.metrics:
+                values = pd.to_numeric(runs.loc[cell, metric], errors="coerce") if metric in runs else []
+                row[metric].append(np.nanmin(values) if np.any(np.isfinite(values)) else math.nan)
+        index.append((image, *parameter_values) if parameter_values else image)
+        rows.append(sum(row.values(), []))
+
+    columns_pandas = []
+    columns_markdown = []
+    for metric in benchmark.metrics.values():
+        include_metric = True
+        last_implementation = ""
+        for implementation in benchmark.implementations:
+            column_markdown = ""
+
+            # Metric
+            if include_metric:
+                column_markdown += metric
+            column_markdown += "<br>"
+            include_metric = False
+
+            # Implementation
+            if implementation != last_implementation:
+                last_implementation = implementation
+                column_markdown += implementation.replace("_", "<br>")
+
+            columns_markdown.append(column_markdown)
+            columns_pandas.append((metric, implementation))
+
+    data = {
+        "index": index,
+        "columns": columns_pandas,
+        "data": rows,
+        "index_names": ["Image"] + [parameter_label(name) for name in benchmark.parameters],
+        "column_names": ["Metric", "Implementation"],
+    }
+
+    # Print and save as CSV
+    df = pd.DataFrame.from_dict(data, orient="tight")
+    print(df)
+    print()
+    df.to_csv(f"{benchmark.summary_path}.csv")
+
+    # Print and save markdown
+    df_markdown = df.copy()
+    df_markdown.columns = columns_markdown
+    if benchmark.parameters:
+        df_markdown.reset_index(inplace=True)
+    print(df_markdown.to_markdown(index=not benchmark.parameters, floatfmt=benchmark.floatfmt))
+    df_markdown.to_markdown(f"{benchmark.summary_path}.md", floatfmt=benchmark.floatfmt)
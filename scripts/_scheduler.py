@@ -0,0 +1,70 @@
+
+import asyncio
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Requests in flight if a limit is not set, creating a task per chunk up front does not scale to millions of chunks
+DEFAULT_LIMIT = 1024
+
+async def run_bounded(function, items, limit: int | None = None):
+    """Await function(item) for each item with at most limit in flight.
+
+    Items are drawn lazily from the (possibly unbounded) iterable, so a new request is only created when
+    one completes (backpressure). Results are discarded. On failure the requests in flight are cancelled.
+    """
+    limit = limit or DEFAULT_LIMIT
+    items = iter(items)
+    pending = set()
+    try:
+        while True:
+            for item in itertools.islice(items, limit - len(pending)):
+                pending.add(asyncio.create_task(function(item)))
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+def run_bounded_threads(function, items, limit: int | None = None):
+    """run_bounded for blocking functions, called from a pool of limit threads (by default, that of ThreadPoolExecutor)."""
+    limit = limit or min(32, (os.cpu_count() or 1) + 4)
+    items = iter(items)
+    pending = set()
+    with ThreadPoolExecutor(limit) as executor:
+        try:
+            while True:
+                for item in itertools.islice(items, limit - len(pending)):
+                    pending.add(executor.submit(function, item))
+                if not pending:
+                    return
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+async def run_taskgroup(function, items, limit: int | None = None):
+    """Create a task per item up front, unbounded (limit is ignored)."""
+    async with asyncio.TaskGroup() as tg:
+        for item in items:
+            tg.create_task(function(item))
+
+async def run_semaphore(function, items, limit: int | None = None):
+    """Create a task per item up front, with at most limit running at once."""
+    semaphore = asyncio.Semaphore(limit or DEFAULT_LIMIT)
+    async def function_limit(item):
+        async with semaphore:
+            return await function(item)
+    await run_taskgroup(function_limit, items)
+
+SCHEDULERS = {
+    "taskgroup": run_taskgroup,
+    "semaphore": run_semaphore,
+    "bounded": run_bounded,
+}
@@ -0,0 +1,49 @@
+
+import numpy as np
+
+def parse_shape(ctx, param, value):
+    """click callback parsing a shape such as 100,100,100."""
+    if value is None:
+        return None
+    return [int(size) for size in value.split(",")]
+
+def random_boxes(shape, box_shape, count: int, seed: int) -> list[tuple[slice, ...]]:
+    """A seeded list of boxes of box_shape at uniformly random (generally chunk unaligned) offsets within shape."""
+    assert len(shape) == len(box_shape)
+    rng = np.random.default_rng(seed)
+    box_shape = [min(box, size) for box, size in zip(box_shape, shape)]
+    offsets = rng.integers(0, [size - box + 1 for size, box in zip(shape, box_shape)], size=(count, len(shape)))
+    return [
+        tuple(slice(int(offset), int(offset) + box) for offset, box in zip(box_offsets, box_shape))
+        for box_offsets in offsets
+    ]
+
+def random_planes(shape, axis: int, count: int, seed: int) -> list[tuple[slice, ...]]:
+    """A seeded list of count distinct planes orthogonal to axis (e.g. axis 0 gives z-planes)."""
+    rng = np.random.default_rng(seed)
+    indices = np.sort(rng.choice(shape[axis], size=min(count, shape[axis]), replace=False))
+    return [
+        tuple(slice(int(index), int(index) + 1) if dim == axis else slice(0, size) for dim, size in enumerate(shape))
+        for index in indices
+    ]
+
+def zipf_chunks(num_chunks, count: int, skew: float, seed: int) -> list[tuple[int, ...]]:
+    """A seeded list of count chunk indices of a grid of num_chunks, the k-th most popular accessed with probability proportional to 1 / k^skew.
+
+    Popularity ranks are assigned to chunks in a random order, so popular chunks are scattered over the array.
+    A skew of 0 is uniformly random.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(np.prod(num_chunks))
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    ranks = rng.choice(n, size=count, p=weights / weights.sum())
+    chunks = rng.permutation(n)[ranks]
+    return [tuple(int(index) for index in np.unravel_index(chunk, num_chunks)) for chunk in chunks]
+
+def chunk_bytes_decoded(selections, chunk_shape, itemsize: int) -> int:
+    """Bytes of the chunks intersected by the selections, i.e. what is decoded if whole chunks are decoded."""
+    chunk_nbytes = int(np.prod(chunk_shape)) * itemsize
+    return sum(
+        int(np.prod([(s.stop - 1) // size - s.start // size + 1 for s, size in zip(selection, chunk_shape)])) * chunk_nbytes
+        for selection in selections
+    )
@@ -0,0 +1,83 @@
+
+import json
+import math
+import os
+
+import numpy as np
+
+# The offset and nbytes of a chunk missing from a shard (the fill value)
+MISSING = 2**64 - 1
+
+def array_metadata(path) -> dict:
+    with open(os.path.join(path, "zarr.json")) as f:
+        return json.load(f)
+
+def chunk_layout(metadata: dict) -> dict:
+    """The stored chunk layout of a Zarr V3 array.
+
+    shard_shape is the shape of each stored file (the chunk grid), chunk_shape that of the chunks it holds
+    (equal to shard_shape if unsharded) and codecs their codecs. index_location and index_checksum are
+    those of the shard index (None if unsharded).
+    """
+    shard_shape = metadata["chunk_grid"]["configuration"]["chunk_shape"]
+    codecs = metadata["codecs"]
+    layout = {"shard_shape": shard_shape, "chunk_shape": shard_shape, "codecs": codecs, "index_location": None, "index_checksum": None}
+    if codecs[0]["name"] == "sharding_indexed":
+        configuration = codecs[0]["configuration"]
+        layout.update({
+            "chunk_shape": configuration["chunk_shape"],
+            "codecs": configuration["codecs"],
+            "index_location": configuration.get("index_location", "end"),
+            "index_checksum": any(codec["name"] == "crc32c" for codec in configuration.get("index_codecs", [])),
+        })
+    return layout
+
+def chunk_key(metadata: dict, chunk_index) -> str:
+    """The store key of a chunk (or shard) with the chunk key encoding of the array."""
+    encoding = metadata["chunk_key_encoding"]
+    separator = encoding.get("configuration", {}).get("separator", "/" if encoding["name"] == "default" else ".")
+    if encoding["name"] == "default":
+        return separator.join(["c", *map(str, chunk_index)])
+    return separator.join(map(str, chunk_index)) if chunk_index else "0"
+
+def chunks_per_shard(layout: dict) -> list[int]:
+    return [shard // chunk for shard, chunk in zip(layout["shard_shape"], layout["chunk_shape"])]
+
+def shard_index_nbytes(layout: dict) -> int:
+    return math.prod(chunks_per_shard(layout)) * 16 + (4 if layout["index_checksum"] else 0)
+
+def parse_shard_index(index: bytes, layout: dict) -> np.ndarray:
+    """The (offset, nbytes) of each chunk of a shard, shaped chunks_per_shard + [2]. The checksum is not verified."""
+    nbytes = shard_index_nbytes(layout)
+    assert len(index) == nbytes, f"Expected a {nbytes} byte shard index, got {len(index)} bytes"
+    return np.frombuffer(index, dtype="<u8", count=math.prod(chunks_per_shard(layout)) * 2).reshape(chunks_per_shard(layout) + [2])
+
+def read_shard_index(f, layout: dict) -> np.ndarray:
+    """Read and parse the index of the shard open as f (a binary file)."""
+    nbytes = shard_index_nbytes(layout)
+    if layout["index_location"] == "end":
+        f.seek(-nbytes, os.SEEK_END)
+    else:
+        f.seek(0)
+    return parse_shard_index(f.read(nbytes), layout)
+
+def stored_chunks(path):
+    """Yield the (file path, offset, nbytes) of every stored chunk of the filesystem array at path.
+
+    For sharded arrays, these are the inner chunks present in each shard, in index order.
+    """
+    metadata = array_metadata(path)
+    layout = chunk_layout(metadata)
+    grid = [(size + shard - 1) // shard for size, shard in zip(metadata["shape"], layout["shard_shape"])]
+    for shard_index in np.ndindex(*grid):
+        file_path = os.path.join(path, chunk_key(metadata, shard_index))
+        if not os.path.exists(file_path):
+            continue
+        if layout["index_location"] is None:
+            yield file_path, 0, os.path.getsize(file_path)
+            continue
+        with open(file_path, "rb") as f:
+            index = read_shard_index(f, layout)
+        for offset, nbytes in index.reshape(-1, 2):
+            if offset != MISSING:
+                yield file_path, int(offset), int(nbytes)
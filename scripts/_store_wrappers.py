@@ -0,0 +1,232 @@
+
+import asyncio
+import contextlib
+import itertools
+import math
+import mmap
+
+import numpy as np
+from zarr.abc.store import OffsetByteRequest, RangeByteRequest, SuffixByteRequest
+from zarr.core.buffer import default_buffer_prototype
+from zarr.storage import LocalStore, WrapperStore
+
+from _shard_index import MISSING, array_metadata, chunk_key, chunk_layout, chunks_per_shard, parse_shard_index, shard_index_nbytes
+
+class ShardIndexCacheStore(WrapperStore):
+    """Caches the shard indexes read through a store, counting hits and misses.
+
+    zarr-python reads the index of a shard for every partial (e.g. inner chunk) read of it. Requests for the
+    index_nbytes at the index_location of a shard are answered from the cache, and concurrent requests for
+    an index share one read. A failed read is not cached, so it is retried by the next request. The store
+    only sees the encoded index, so it is still decoded (and its checksum verified) for each read.
+    """
+
+    def __init__(self, store, index_nbytes: int, index_location: str = "end"):
+        super().__init__(store)
+        self.index_nbytes = index_nbytes
+        self.index_location = index_location
+        self.hits = 0
+        self.misses = 0
+        self._indexes = {}
+
+    @classmethod
+    def for_array(cls, store, path) -> "ShardIndexCacheStore":
+        """A cache for the shard indexes of the filesystem array at path, read through store."""
+        layout = chunk_layout(array_metadata(path))
+        if layout["index_location"] is None:
+            return cls(store, 0, None)
+        return cls(store, shard_index_nbytes(layout), layout["index_location"])
+
+    def is_index_request(self, byte_range) -> bool:
+        if self.index_location == "end":
+            return isinstance(byte_range, SuffixByteRequest) and byte_range.suffix == self.index_nbytes
+        elif self.index_location == "start":
+            return isinstance(byte_range, RangeByteRequest) and byte_range.start == 0 and byte_range.end == self.index_nbytes
+        return False
+
+    async def get(self, key, prototype, byte_range=None):
+        if not self.is_index_request(byte_range):
+            return await super().get(key, prototype, byte_range)
+        if key in self._indexes:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._indexes[key] = asyncio.ensure_future(super().get(key, prototype, byte_range))
+        future = self._indexes[key]
+        try:
+            return await future
+        except Exception:
+            # Read the index again next time, rather than caching a (possibly transient) error
+            if self._indexes.get(key) is future:
+                self._indexes.pop(key)
+            raise
+
+    def __repr__(self) -> str:
+        return f"ShardIndexCacheStore({self._store!r})"
+
+def request_key(byte_range) -> tuple | None:
+    """A hashable key of a byte range request (None for a whole value)."""
+    if isinstance(byte_range, RangeByteRequest):
+        return ("range", byte_range.start, byte_range.end)
+    elif isinstance(byte_range, SuffixByteRequest):
+        return ("suffix", byte_range.suffix)
+    return None
+
+class CoalescingStore(WrapperStore):
+    """Merges the inner chunk byte range reads of each partial shard read into fewer, larger reads.
+
+    zarr-python reads the index of a shard, then each inner chunk a read needs with its own range request,
+    awaiting them one at a time, so a store cannot see them together. Instead, a read of a selection is
+    wrapped in coalesced(selection): the shard indexes are read first, and the ranges of the inner chunks
+    the selection intersects are sorted and those separated by at most gap_bytes merged into one read,
+    which are issued concurrently. The requests of the read (the indexes and ranges) are then answered
+    from memory. Whole shard reads are one read already, and are passed through, as are requests outside
+    of coalesced(). Counts the range requests and reads, the bytes requested and read, and the bytes
+    over-read (read in the gaps, not requested).
+    """
+
+    def __init__(self, store, metadata: dict, gap_bytes: int = 4096):
+        super().__init__(store)
+        self.metadata = metadata
+        self.layout = chunk_layout(metadata)
+        self.gap_bytes = gap_bytes
+        self.requests = 0
+        self.reads = 0
+        self.bytes_requested = 0
+        self.bytes_read = 0
+        self.bytes_over_read = 0
+        self.index_key = request_key(self.index_request()) if self.layout["index_location"] is not None else None
+        # (key, request_key) -> [value, number of coalesced reads holding it]
+        self._prefetched = {}
+
+    @classmethod
+    def for_array(cls, store, path, gap_bytes: int = 4096) -> "CoalescingStore":
+        """Coalesce the reads of the filesystem array at path, read through store."""
+        return cls(store, array_metadata(path), gap_bytes)
+
+    def index_request(self):
+        nbytes = shard_index_nbytes(self.layout)
+        return SuffixByteRequest(nbytes) if self.layout["index_location"] == "end" else RangeByteRequest(0, nbytes)
+
+    def merge(self, requests) -> list[list]:
+        """Group (start, end) requests into [start, end, requests] reads, merging gaps of up to gap_bytes."""
+        reads = []
+        for start, end in sorted(requests):
+            if reads and start <= reads[-1][1] + self.gap_bytes:
+                reads[-1][1] = max(reads[-1][1], end)
+                reads[-1][2].append((start, end))
+            else:
+                reads.append([start, end, [(start, end)]])
+        return reads
+
+    async def read(self, key, prototype, start: int, end: int, requests) -> list:
+        data = await self._store.get(key, prototype, RangeByteRequest(start, end))
+        self.reads += 1
+        if data is None:
+            return []
+        self.bytes_read += len(data)
+        # The bytes of the read not covered by a request (requests are sorted by start)
+        covered_end = start
+        for request_start, request_end in requests:
+            self.bytes_over_read += max(0, request_start - covered_end)
+            covered_end = max(covered_end, request_end)
+        return [((key, ("range", request_start, request_end)), data[request_start - start:request_end - start]) for request_start, request_end in requests]
+
+    async def prefetch_shard(self, shard_index, selection, prototype) -> list:
+        """The (key, request_key) and values of the index and inner chunk ranges of a shard needed to read selection."""
+        shard_shape, chunk_shape = self.layout["shard_shape"], self.layout["chunk_shape"]
+        within = [slice(max(s.start - i * shard, 0), min(s.stop - i * shard, shard)) for s, i, shard in zip(selection, shard_index, shard_shape)]
+        chunk_indices = list(itertools.product(*(range(w.start // chunk, (w.stop - 1) // chunk + 1) for w, chunk in zip(within, chunk_shape))))
+        if len(chunk_indices) == math.prod(chunks_per_shard(self.layout)):
+            return []
+        key = chunk_key(self.metadata, shard_index)
+        index_request = self.index_request()
+        index = await self._store.get(key, prototype, index_request)
+        if index is None:
+            return []
+        offsets = parse_shard_index(index.to_bytes(), self.layout)
+        requests = [(int(offset), int(offset + nbytes)) for offset, nbytes in (offsets[chunk_index] for chunk_index in chunk_indices) if offset != MISSING]
+        reads = await asyncio.gather(*(self.read(key, prototype, *merged) for merged in self.merge(requests)))
+        return [((key, request_key(index_request)), index), *itertools.chain.from_iterable(reads)]
+
+    @contextlib.asynccontextmanager
+    async def coalesced(self, selection, prototype=None):
+        """Prefetch the reads of selection (a box of slices) of a sharded array with merged reads while in the context."""
+        if self.layout["index_location"] is None:
+            yield
+            return
+        prototype = prototype or default_buffer_prototype()
+        shard_ranges = [range(s.start // shard, (s.stop - 1) // shard + 1) for s, shard in zip(selection, self.layout["shard_shape"])]
+        shards = await asyncio.gather(*(self.prefetch_shard(shard_index, selection, prototype) for shard_index in itertools.product(*shard_ranges)))
+        entries = list(itertools.chain.from_iterable(shards))
+        for entry_key, value in entries:
+            self._prefetched.setdefault(entry_key, [value, 0])[1] += 1
+        try:
+            yield
+        finally:
+            for entry_key, _ in entries:
+                entry = self._prefetched[entry_key]
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._prefetched[entry_key]
+
+    async def get(self, key, prototype, byte_range=None):
+        is_range = isinstance(byte_range, RangeByteRequest) and request_key(byte_range) != self.index_key
+        if is_range:
+            self.requests += 1
+            self.bytes_requested += byte_range.end - byte_range.start
+        entry = self._prefetched.get((key, request_key(byte_range)))
+        if entry is not None:
+            return entry[0]
+        data = await super().get(key, prototype, byte_range)
+        if is_range:
+            self.reads += 1
+            self.bytes_read += 0 if data is None else len(data)
+        return data
+
+    def __repr__(self) -> str:
+        return f"CoalescingStore({self._store!r})"
+
+def mmap_file(path, byte_range=None) -> np.ndarray:
+    """A read-only byte view of a memory-mapped file (or a byte range of it), which keeps it mapped while alive."""
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        if size == 0:
+            return np.empty(0, dtype="b")
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    start, end = 0, size
+    if isinstance(byte_range, RangeByteRequest):
+        start, end = byte_range.start, min(byte_range.end, size)
+    elif isinstance(byte_range, OffsetByteRequest):
+        start = byte_range.offset
+    elif isinstance(byte_range, SuffixByteRequest):
+        start = max(0, size - byte_range.suffix)
+    elif byte_range is not None:
+        raise TypeError(f"Unexpected byte_range, got {byte_range}.")
+    if hasattr(mmap, "MADV_WILLNEED"):
+        # Start reading the pages ahead of the faults of the first copy
+        page_start = start - start % mmap.PAGESIZE
+        mapped.madvise(mmap.MADV_WILLNEED, page_start, end - page_start)
+    return np.frombuffer(mapped, dtype="b")[start:end]
+
+class MmapStore(LocalStore):
+    """A LocalStore returning buffers that are views of memory-mapped files, rather than copies read from them.
+
+    Values without bytes-to-bytes codecs (e.g. uncompressed chunks) are then only copied once, from the page cache into the output.
+    """
+
+    async def get(self, key, prototype=None, byte_range=None):
+        if prototype is None:
+            prototype = default_buffer_prototype()
+        if not self._is_open:
+            await self._open()
+        try:
+            return prototype.buffer.from_array_like(mmap_file(self.root / key, byte_range))
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+
+    async def get_partial_values(self, prototype, key_ranges):
+        return [await self.get(key, prototype, byte_range) for key, byte_range in key_ranges]
+
+    def __repr__(self) -> str:
+        return f"MmapStore('{self}')"
@@ -0,0 +1,77 @@
+
+import os
+import shutil
+import tempfile
+
+# Stores of --store: the filesystem, or a copy of the dataset loaded into memory before timing starts
+STORES = ["local", "memory"]
+
+def store_files(path):
+    """Yield the (key, path) of every file of a filesystem store."""
+    for root, _, files in os.walk(path):
+        for file in files:
+            file_path = os.path.join(root, file)
+            yield os.path.relpath(file_path, path).replace(os.sep, "/"), file_path
+
+def memory_store(path, read_only=True):
+    """A zarr MemoryStore holding a copy of every file of the filesystem store at path."""
+    from zarr.core.buffer import default_buffer_prototype
+    from zarr.storage import MemoryStore
+
+    prototype = default_buffer_prototype()
+    store_dict = {}
+    for key, file_path in store_files(path):
+        with open(file_path, "rb") as f:
+            store_dict[key] = prototype.buffer.from_bytes(f.read())
+    return MemoryStore(store_dict, read_only=read_only)
+
+def tmpfs_copy(path, directory="/dev/shm") -> tempfile.TemporaryDirectory:
+    """A copy of the filesystem store at path on tmpfs, for implementations that only support filesystem stores.
+
+    The copy is at os.path.join(copy.name, "array") and is removed when the returned directory is cleaned up.
+    """
+    copy = tempfile.TemporaryDirectory(dir=directory)
+    shutil.copytree(path, os.path.join(copy.name, "array"))
+    return copy
+
+def evict_files(path):
+    """Evict the files under path from the page cache with posix_fadvise(POSIX_FADV_DONTNEED).
+
+    Unlike dropping the caches of the whole system, this needs no privileges and leaves the page cache of other files (and users) alone.
+    Pages that are dirty or mapped by another process are not evicted.
+    """
+    if not hasattr(os, "posix_fadvise"):
+        raise Exception("Unsupported platform")
+    file_paths = [path] if os.path.isfile(path) else [file_path for _, file_path in store_files(path)]
+    for file_path in file_paths:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+def directory_nbytes(path) -> int:
+    return sum(os.path.getsize(file_path) for _, file_path in store_files(path))
+
+def memory_store_nbytes(store) -> int:
+    return sum(len(buffer) for buffer in store._store_dict.values())
+
+def tensorstore_memory_kvstore(path, context, prefix="input/") -> tuple[dict, int]:
+    """Copy every file of the filesystem store at path into the tensorstore memory kvstore of context, under prefix.
+
+    Returns the kvstore spec of the copy and its size in bytes.
+    """
+    import tensorstore as ts
+
+    kvstore = {"driver": "memory", "path": prefix}
+    memory = ts.KvStore.open(kvstore, context=context).result()
+    nbytes = 0
+    writes = []
+    for key, file_path in store_files(path):
+        with open(file_path, "rb") as f:
+            value = f.read()
+        nbytes += len(value)
+        writes.append(memory.write(key, value))
+    for write in writes:
+        write.result()
+    return kvstore, nbytes
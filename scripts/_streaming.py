@@ -0,0 +1,39 @@
+
+import math
+import timeit
+
+import numpy as np
+import zarr
+
+from _scheduler import run_bounded
+from _telemetry import Telemetry
+
+def shards_in_flight_limit(shard_nbytes: int, shards_in_flight: int, memory_budget_gb: float | None) -> int:
+    """The number of shards to copy at once, such that their decoded bytes fit within the memory budget."""
+    if memory_budget_gb is None:
+        return shards_in_flight
+    budget_shards = int(memory_budget_gb * 1.0e9) // shard_nbytes
+    if budget_shards < 1:
+        raise ValueError(f"A memory budget of {memory_budget_gb}GB cannot hold a {shard_nbytes / 1.0e9:.3f}GB shard")
+    return min(shards_in_flight, budget_shards)
+
+async def stream_copy(dataset: zarr.Array, dataset_out: zarr.Array, shards_in_flight: int, memory_budget_gb: float | None, telemetry: Telemetry):
+    """Copy dataset to dataset_out shard by shard (chunk by chunk if unsharded) with a bounded number of shards in flight.
+
+    The arrays must have the same shape and shard (or chunk) grid, so each shard is written whole.
+    """
+    shard_shape = dataset.shards or dataset.chunks
+    assert dataset.shape == dataset_out.shape and shard_shape == (dataset_out.shards or dataset_out.chunks)
+    limit = shards_in_flight_limit(math.prod(shard_shape) * dataset.dtype.itemsize, shards_in_flight, memory_budget_gb)
+    telemetry.extra["shards_in_flight"] = limit
+    print("Shards in flight", limit)
+
+    async def copy_shard(shard_index):
+        start_time = timeit.default_timer()
+        selection = tuple(slice(i * s, min((i + 1) * s, size)) for i, s, size in zip(shard_index, shard_shape, dataset.shape))
+        data = await dataset._async_array.getitem(selection)
+        telemetry.chunk_read(data.nbytes, timeit.default_timer() - start_time)
+        await dataset_out._async_array.setitem(selection, data)
+
+    num_shards = [(size + shard - 1) // shard for size, shard in zip(dataset.shape, shard_shape)]
+    await run_bounded(copy_shard, np.ndindex(*num_shards), limit)
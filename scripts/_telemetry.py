@@ -0,0 +1,160 @@
+
+import json
+import os
+import threading
+import timeit
+
+# Prefix of the stdout line holding the JSON telemetry record of a benchmark script
+TELEMETRY_PREFIX = "TELEMETRY "
+
+def process_elapsed_s() -> float | None:
+    """Seconds since this process started (Linux only), covering interpreter start-up and imports."""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime") as f:
+            uptime_s = float(f.read().split()[0])
+    except OSError:
+        return None
+    return uptime_s - start_ticks / os.sysconf("SC_CLK_TCK")
+
+def io_counters() -> dict:
+    """Bytes passed through (and the number of) read/write syscalls by this process (Linux only)."""
+    counters = {}
+    try:
+        with open("/proc/self/io") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                counters[name] = int(value)
+    except OSError:
+        pass
+    return counters
+
+class Telemetry:
+    """Timings and counters of a benchmark script, emitted as one JSON record for the benchmark runner.
+
+    Call opened() once the array is open, then chunk_read() for each chunk (or array_read() for a
+    whole array, or selection_read() for each selection), then finished() and emit().
+    Reads may be recorded from multiple threads. Chunk latencies are optional, and are emitted raw
+    (chunk_latencies_s) as well as summarised so the runner can store their distribution.
+    A workload repeated in passes brackets each with start_pass() and finish_pass().
+    bytes_read counts the bytes of read syscalls, so scripts reading a store without them (from memory or
+    memory-mapped files) set syscall_reads to False, and it is not reported.
+    """
+
+    def __init__(self):
+        self.startup_s = process_elapsed_s()
+        self._start_time = timeit.default_timer()
+        self._opened_time = None
+        self._finish_time = None
+        self._first_chunk_time = None
+        self._io_start = {}
+        self._io_end = {}
+        self._lock = threading.Lock()
+        self.syscall_reads = True
+        self.chunks = 0
+        self.selections = 0
+        self.bytes_decoded = 0
+        self.latencies_s = []
+        self.chunk_latencies_s = []
+        self.pass_times_s = []
+        self._pass_start_time = None
+        self.extra = {}
+
+    def opened(self):
+        self._io_start = io_counters()
+        self._opened_time = timeit.default_timer()
+
+    def chunk_read(self, nbytes: int, latency_s: float | None = None):
+        with self._lock:
+            if self._first_chunk_time is None:
+                self._first_chunk_time = timeit.default_timer()
+            self.chunks += 1
+            self.bytes_decoded += nbytes
+            if latency_s is not None:
+                self.chunk_latencies_s.append(latency_s)
+
+    def array_read(self, nbytes: int, chunks: int):
+        with self._lock:
+            self.chunks += chunks
+            self.bytes_decoded += nbytes
+
+    def selection_read(self, nbytes: int, latency_s: float):
+        with self._lock:
+            if self._first_chunk_time is None:
+                self._first_chunk_time = timeit.default_timer()
+            self.selections += 1
+            self.bytes_decoded += nbytes
+            self.latencies_s.append(latency_s)
+
+    def start_pass(self):
+        self._pass_start_time = timeit.default_timer()
+
+    def finish_pass(self):
+        self.pass_times_s.append(timeit.default_timer() - self._pass_start_time)
+
+    @staticmethod
+    def latency_percentiles(latencies_s, prefix: str = "latency") -> dict:
+        if not latencies_s:
+            return {}
+        # Imported here so importing this module stays cheap (see python_benchmark_startup.py)
+        import numpy as np
+        p50, p90, p99 = np.percentile(latencies_s, [50, 90, 99])
+        return {
+            f"{prefix}_p50_s": p50,
+            f"{prefix}_p90_s": p90,
+            f"{prefix}_p99_s": p99,
+            f"{prefix}_max_s": max(latencies_s),
+        }
+
+    @staticmethod
+    def pass_times(pass_times_s) -> dict:
+        """The time of the first (cold) pass and the mean of the later (warm) passes, if repeated."""
+        if len(pass_times_s) < 2:
+            return {}
+        return {
+            "passes": len(pass_times_s),
+            "first_pass_s": pass_times_s[0],
+            "warm_pass_s": sum(pass_times_s[1:]) / (len(pass_times_s) - 1),
+        }
+
+    def finished(self):
+        self._finish_time = timeit.default_timer()
+        self._io_end = io_counters()
+
+    @property
+    def elapsed_s(self) -> float:
+        """Seconds from opening the array to finishing."""
+        return self._finish_time - self._opened_time
+
+    def record(self) -> dict:
+        io_start, io_end = self._io_start, self._io_end
+        first_chunk_s = None if self._first_chunk_time is None else self._first_chunk_time - self._opened_time
+        return {
+            "startup_s": self.startup_s,
+            "open_s": self._opened_time - self._start_time,
+            "first_chunk_s": first_chunk_s,
+            "elapsed_s": self.elapsed_s,
+            "steady_state_s": None if first_chunk_s is None else self.elapsed_s - first_chunk_s,
+            "chunks": self.chunks,
+            "selections": self.selections,
+            "bytes_read": io_end["rchar"] - io_start["rchar"] if io_end and self.syscall_reads else None,
+            "bytes_written": io_end["wchar"] - io_start["wchar"] if io_end else None,
+            "read_syscalls": io_end["syscr"] - io_start["syscr"] if io_end else None,
+            "bytes_decoded": self.bytes_decoded,
+            **self.latency_percentiles(self.latencies_s),
+            **self.latency_percentiles(self.chunk_latencies_s, "chunk_latency"),
+            **({"chunk_latencies_s": self.chunk_latencies_s} if self.chunk_latencies_s else {}),
+            **self.pass_times(self.pass_times_s),
+            **self.extra,
+        }
+
+    def emit(self):
+        print(TELEMETRY_PREFIX + json.dumps(self.record()), flush=True)
+
+def parse_telemetry(std_out: str) -> dict:
+    """Extract the telemetry record from the stdout of a benchmark script, if any."""
+    for line in reversed(std_out.splitlines()):
+        if line.startswith(TELEMETRY_PREFIX):
+            return json.loads(line[len(TELEMETRY_PREFIX):])
+    return {}
@@ -0,0 +1,112 @@
+
+import os
+import threading
+import timeit
+
+import pandas as pd
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def supported() -> bool:
+    return os.path.exists("/proc/self/task")
+
+def _read(path) -> str | None:
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        # The process or thread has exited
+        return None
+
+def _read_tids(pid: int) -> list[str]:
+    try:
+        return os.listdir(f"/proc/{pid}/task")
+    except OSError:
+        return []
+
+def _children(pid: int) -> list[int]:
+    children = []
+    for tid in _read_tids(pid):
+        if text := _read(f"/proc/{pid}/task/{tid}/children"):
+            children += [int(child) for child in text.split()]
+    return children
+
+def _descendants(pid: int) -> list[int]:
+    descendants = []
+    pending = _children(pid)
+    while pending:
+        child = pending.pop()
+        descendants.append(child)
+        pending += _children(child)
+    return descendants
+
+def _thread_cpu_s(pid: int, tid: str) -> float | None:
+    """Thread CPU time in seconds, from schedstat (ns resolution) if available, else stat (clock ticks)."""
+    if text := _read(f"/proc/{pid}/task/{tid}/schedstat"):
+        return int(text.split()[0]) / 1.0e9
+    if text := _read(f"/proc/{pid}/task/{tid}/stat"):
+        fields = text.rpartition(")")[2].split()
+        return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+    return None
+
+def _process_io(pid: int) -> dict:
+    io = {}
+    if text := _read(f"/proc/{pid}/io"):
+        for line in text.splitlines():
+            name, _, value = line.partition(":")
+            io[name] = int(value)
+    return io
+
+def _process_rss_bytes(pid: int) -> int | None:
+    if text := _read(f"/proc/{pid}/statm"):
+        return int(text.split()[1]) * PAGE_SIZE
+    return None
+
+class ProcessSampler(threading.Thread):
+    """Samples the descendants of a process from /proc at a fixed interval.
+
+    Each sample has one row per thread with its CPU utilisation since the previous sample (in cores),
+    alongside the resident set size and cumulative I/O bytes of its process.
+    """
+
+    def __init__(self, pid: int, interval: float):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.rows = []
+        self._stopped = threading.Event()
+        self._last_cpu_s = {}
+
+    def run(self):
+        start_time = timeit.default_timer()
+        while not self._stopped.is_set():
+            self.sample(timeit.default_timer() - start_time)
+            self._stopped.wait(self.interval)
+
+    def sample(self, time_s: float):
+        for pid in _descendants(self.pid):
+            rss_bytes = _process_rss_bytes(pid)
+            io = _process_io(pid)
+            for tid in _read_tids(pid):
+                cpu_s = _thread_cpu_s(pid, tid)
+                if rss_bytes is None or cpu_s is None:
+                    continue
+                last_time_s, last_cpu_s = self._last_cpu_s.get((pid, tid), (time_s, cpu_s))
+                self._last_cpu_s[(pid, tid)] = (time_s, cpu_s)
+                self.rows.append({
+                    "time_s": time_s,
+                    "pid": pid,
+                    "tid": int(tid),
+                    "cpu": (cpu_s - last_cpu_s) / (time_s - last_time_s) if time_s > last_time_s else 0.0,
+                    "rss_gb": rss_bytes / 1.0e9,
+                    "read_bytes": io.get("read_bytes"),
+                    "write_bytes": io.get("write_bytes"),
+                    "rchar": io.get("rchar"),
+                    "wchar": io.get("wchar"),
+                })
+
+    def stop(self) -> pd.DataFrame:
+        self._stopped.set()
+        self.join()
+        return pd.DataFrame(self.rows)
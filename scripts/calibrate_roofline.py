@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import math
+import os
+import timeit
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+import numcodecs
+import numcodecs.blosc
+import numpy as np
+import pandas as pd
+
+from _benchmarks import IMAGES
+from _run_benchmark import CACHE_EVICTION, evict_cache
+from _shard_index import array_metadata, chunk_layout, stored_chunks
+
+ROOFLINE_CSV = "measurements/roofline.csv"
+
+# Ceilings measured for each image, as the throughput (GB/s) of decoded bytes they allow so they bound throughput_gbps
+CEILINGS = {
+    "disk_sequential_gbps": "Disk (sequential)",
+    "disk_parallel_gbps": "Disk (parallel)",
+    "memcpy_gbps": "memcpy (single-threaded)",
+    "memcpy_parallel_gbps": "memcpy (multi-threaded)",
+    "decode_gbps": "Blosc decode (single-threaded)",
+    "decode_parallel_gbps": "Blosc decode (multi-threaded)",
+}
+
+def best_time(function, repetitions: int) -> float:
+    return min(timeit.timeit(function, number=1) for _ in range(repetitions))
+
+def read_file(path) -> int:
+    with open(path, "rb", buffering=0) as f:
+        return len(f.read())
+
+def disk_time(image, paths, threads: int, cache_eviction: str) -> float:
+    """The time to read every file of image with a cold page cache, one at a time or from a pool of threads."""
+    evict_cache(image, cache_eviction)
+    start_time = timeit.default_timer()
+    if threads == 1:
+        for path in paths:
+            read_file(path)
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(read_file, paths))
+    return timeit.default_timer() - start_time
+
+def memcpy_gbps(nbytes: int, threads: int, repetitions: int) -> float:
+    """The bandwidth of copying nbytes between two (already faulted in) arrays, split between threads."""
+    src = np.ones(nbytes, dtype=np.uint8)
+    dst = np.zeros_like(src)
+    blocks = list(zip(np.array_split(src, threads), np.array_split(dst, threads)))
+    with ThreadPoolExecutor(threads) as executor:
+        def copy():
+            # numpy releases the GIL while copying
+            list(executor.map(lambda block: np.copyto(block[1], block[0]), blocks))
+        return nbytes / best_time(copy, repetitions) / 1.0e9
+
+def load_chunks(path, budget_bytes: int) -> list[bytes]:
+    """The encoded bytes of the stored chunks of an array, up to budget_bytes."""
+    chunks = []
+    nbytes = 0
+    for file_path, offset, chunk_nbytes in stored_chunks(path):
+        if nbytes + chunk_nbytes > budget_bytes and chunks:
+            break
+        with open(file_path, "rb") as f:
+            f.seek(offset)
+            chunks.append(f.read(chunk_nbytes))
+        nbytes += chunk_nbytes
+    return chunks
+
+def decode_gbps(chunks: list[bytes], chunk_nbytes: int, threads: int, repetitions: int) -> float:
+    """The throughput of decoding blosc chunks with numcodecs, from a pool of threads (blosc itself is single-threaded)."""
+    codec = numcodecs.Blosc()
+    numcodecs.blosc.use_threads = False
+    numcodecs.blosc.set_nthreads(1)
+    out = [np.empty(chunk_nbytes, dtype=np.uint8) for _ in range(threads)]
+    def decode_block(block):
+        i, block_chunks = block
+        for chunk in block_chunks:
+            codec.decode(chunk, out=out[i])
+    blocks = list(enumerate(chunks[i::threads] for i in range(threads)))
+    with ThreadPoolExecutor(threads) as executor:
+        def decode():
+            list(executor.map(decode_block, blocks))
+        return len(chunks) * chunk_nbytes / best_time(decode, repetitions) / 1.0e9
+
+@click.command()
+@click.argument('images', nargs=-1)
+@click.option('--threads', type=int, default=os.cpu_count(), show_default=True, help='Number of threads of the parallel (multi-threaded) ceilings.')
+@click.option('--memcpy_gb', type=float, default=1.0, show_default=True, help='Size of the memcpy buffer.')
+@click.option('--decode_gb', type=float, default=1.0, show_default=True, help='Maximum encoded bytes of the chunks decoded by the Blosc decode ceilings.')
+@click.option('--repetitions', type=int, default=3, show_default=True, help='Repetitions of the in-memory ceilings (the best is kept).')
+@click.option('--cache_eviction', type=click.Choice(CACHE_EVICTION), default='drop_caches', show_default=True, help='How the files are evicted from the page cache before the disk ceilings, see run_benchmark.py.')
+@click.option('--output', type=str, default=ROOFLINE_CSV, show_default=True, help='Output CSV, a markdown table is written alongside.')
+def main(images, threads, memcpy_gb, decode_gb, repetitions, cache_eviction, output):
+    """Measure the hardware ceilings (roofline) of reading each of IMAGES (default: the benchmark images).
+
+    Each ceiling is reported as the throughput of decoded bytes it allows, comparable to throughput_gbps.
+    The disk ceilings read the chunk files with a cold cache, the Blosc decode ceilings decode the stored chunks with numcodecs.
+    """
+    images = images or IMAGES
+    memcpy = {
+        "memcpy_gbps": memcpy_gbps(int(memcpy_gb * 1.0e9), 1, repetitions),
+        "memcpy_parallel_gbps": memcpy_gbps(int(memcpy_gb * 1.0e9), threads, repetitions),
+    }
+    print("memcpy", memcpy)
+
+    rows = {}
+    for image in images:
+        metadata = array_metadata(image)
+        layout = chunk_layout(metadata)
+        decoded_bytes = math.prod(metadata["shape"]) * np.dtype(metadata["data_type"]).itemsize
+        paths = sorted({file_path for file_path, _, _ in stored_chunks(image)})
+        stored_bytes = sum(os.path.getsize(path) for path in paths)
+
+        row = {
+            "stored_gb": stored_bytes / 1.0e9,
+            "decoded_gb": decoded_bytes / 1.0e9,
+            "disk_sequential_gbps": decoded_bytes / disk_time(image, paths, 1, cache_eviction) / 1.0e9,
+            "disk_parallel_gbps": decoded_bytes / disk_time(image, paths, threads, cache_eviction) / 1.0e9,
+            **memcpy,
+            "decode_gbps": math.nan,
+            "decode_parallel_gbps": math.nan,
+        }
+        if [codec["name"] for codec in layout["codecs"]] == ["bytes", "blosc"]:
+            chunks = load_chunks(image, int(decode_gb * 1.0e9))
+            chunk_nbytes = math.prod(layout["chunk_shape"]) * np.dtype(metadata["data_type"]).itemsize
+            row["decode_gbps"] = decode_gbps(chunks, chunk_nbytes, 1, repetitions)
+            row["decode_parallel_gbps"] = decode_gbps(chunks, chunk_nbytes, threads, repetitions)
+        print(image, row)
+        rows[image] = row
+
+    df = pd.DataFrame.from_dict(rows, orient="index")
+    df.index.name = "Image"
+    print(df.to_markdown(floatfmt=".02f"))
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    df.to_csv(output)
+    df.to_markdown(f"{os.path.splitext(output)[0]}.md", floatfmt=".02f")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import os
+import click
+
+from _access_trace import PATTERNS, generate_access_trace, write_access_trace
+from _selections import parse_shape
+from generate_benchmark_array import scaled_shape
+
+@click.command()
+@click.argument('output_path')
+@click.option('--pattern', type=click.Choice(PATTERNS), default=None, help='Write a trace of this access pattern to OUTPUT_PATH.')
+@click.option('--all', 'all_patterns', is_flag=True, show_default=True, default=False, help='Write a trace of every pattern in PATTERNS to the OUTPUT_PATH directory, as <pattern>.csv.')
+@click.option('--shape', type=str, default=None, callback=parse_shape, help='Shape of the array read. Defaults to that of the benchmark data, scaled by --scale.')
+@click.option('--scale', type=float, default=1.0, show_default=True, help='Scale of the benchmark data the trace is for.')
+@click.option('--box_shape', type=str, default='100,100,100', callback=parse_shape, show_default=True, help='Shape of the boxes read.')
+@click.option('--count', type=int, default=256, show_default=True, help='Number of boxes read.')
+@click.option('--interval_ms', type=float, default=0.0, show_default=True, help='Time between reads.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the uniform and zipf patterns.')
+@click.option('--skew', type=float, default=1.0, show_default=True, help='Skew of the zipf pattern.')
+@click.option('--stride', type=int, default=2, show_default=True, help='Stride (in boxes) of the strided pattern.')
+@click.option('--step', type=int, default=None, help='Step (in voxels) of the viewport pattern. Defaults to half a box.')
+def main(output_path, pattern, all_patterns, shape, scale, box_shape, count, interval_ms, seed, skew, stride, step):
+    """Generate access traces: timed box reads replayed by the Python read scripts with --access_trace."""
+    shape = shape or scaled_shape(scale)
+    if all_patterns:
+        os.makedirs(output_path, exist_ok=True)
+        outputs = {pattern: os.path.join(output_path, f"{pattern}.csv") for pattern in PATTERNS}
+    elif pattern is not None:
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        outputs = {pattern: output_path}
+    else:
+        raise click.UsageError("Set --pattern or --all")
+    for pattern, path in outputs.items():
+        entries = generate_access_trace(pattern, shape, box_shape, count, interval_ms / 1000.0, seed, skew, stride, step)
+        write_access_trace(path, entries)
+        print(f"Wrote {len(entries)} {pattern} reads to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -1,60 +1,170 @@
 #!/usr/bin/env python3
 
-import subprocess
-import numpy as np
+import math
+import multiprocessing
+import os
+import timeit
 import click
-from functools import reduce
-from operator import mul
+import numpy as np
+
+import zarr
+from zarr.codecs import BloscCodec, Crc32cCodec, GzipCodec, TransposeCodec, ZstdCodec
+
+from _selections import parse_shape
+
+SHAPE = [1024, 2048, 2048]
+
+def scaled_shape(scale: float) -> list[int]:
+    """SHAPE with its size scaled by scale, each axis rounded to a multiple of 32 (the smallest chunk size)."""
+    return [max(32, round(size * scale ** (1 / 3) / 32) * 32) for size in SHAPE]
+
+# Layouts written by --all, relative to the output directory
+LAYOUTS = {
+    "benchmark.zarr": {"shard": False, "compress": False},
+    "benchmark_compress.zarr": {"shard": False, "compress": True},
+    "benchmark_compress_shard.zarr": {"shard": True, "compress": True},
+}
+
+# Named codec configurations of --codec, as zarr.create_array filters (array-to-array),
+# serializer (array-to-bytes, bytes if unset) and compressors (bytes-to-bytes)
+CODECS = {
+    "none": {},
+    "blosc_blosclz": {"compressors": [BloscCodec(cname="blosclz", clevel=9, shuffle="bitshuffle", typesize=2, blocksize=0)]},
+    "blosc_lz4": {"compressors": [BloscCodec(cname="lz4", clevel=5, shuffle="shuffle", typesize=2, blocksize=0)]},
+    "blosc_zstd": {"compressors": [BloscCodec(cname="zstd", clevel=5, shuffle="bitshuffle", typesize=2, blocksize=0)]},
+    "zstd": {"compressors": [ZstdCodec(level=3)]},
+    "gzip": {"compressors": [GzipCodec(level=5)]},
+    "crc32c": {"compressors": [Crc32cCodec()]},
+    "zstd_crc32c": {"compressors": [ZstdCodec(level=3), Crc32cCodec()]},
+    "transpose_zstd": {"filters": [TransposeCodec(order=[2, 1, 0])], "compressors": [ZstdCodec(level=3)]},
+}
+
+# Layouts written by --codec_matrix (256^3 chunks, unsharded), relative to the output directory
+CODEC_LAYOUTS = {f"{codec}.zarr": {"shard": False, "compress": False, "codec": codec} for codec in CODECS}
+
+# Sizes of the compressed and sharded layouts written by --scaling (8GB at scale 1), relative to the output directory
+SCALES = {"64MB": 1 / 128, "256MB": 1 / 32, "1GB": 1 / 8, "4GB": 1 / 2, "8GB": 1, "32GB": 4}
+SCALING_LAYOUTS = {f"benchmark_compress_shard_{size}.zarr": {"shard": True, "compress": True, "scale": scale} for size, scale in SCALES.items()}
+
+# Compressed layouts written by --sweep, relative to the output directory:
+# unsharded chunk shapes, and shard shapes with inner chunks a fraction (ratio) of the shard
+SWEEP_CHUNK_SIZES = [64, 128, 256, 512]
+SWEEP_SHARD_SIZES = [256, 512]
+SWEEP_SHARD_RATIOS = [2, 4, 8]
+SWEEP_LAYOUTS = {
+    **{
+        f"chunk_{chunk}.zarr": {"shard": False, "compress": True, "chunk_shape": [chunk] * 3}
+        for chunk in SWEEP_CHUNK_SIZES
+    },
+    **{
+        f"shard_{shard}_chunk_{shard // ratio}.zarr": {"shard": True, "compress": True, "chunk_shape": [shard // ratio] * 3, "shard_shape": [shard] * 3}
+        for shard in SWEEP_SHARD_SIZES
+        for ratio in SWEEP_SHARD_RATIOS
+    },
+}
+
+def array_kwargs(shard: bool, compress: bool, chunk_shape=None, shard_shape=None, codec=None, scale: float = 1.0) -> dict:
+    """zarr.create_array arguments matching the arrays previously written by zarrs_binary2zarr.
+
+    chunk_shape and shard_shape override the default (inner) chunk and shard shapes, a named codec
+    configuration in CODECS overrides compress, and scale scales the shape (see scaled_shape).
+    """
+    kwargs = {
+        "shape": scaled_shape(scale),
+        "dtype": "uint16",
+        "fill_value": 0,
+        "chunks": chunk_shape or ([32, 32, 32] if shard else [256, 256, 256]),
+        "shards": (shard_shape or [256, 256, 256]) if shard else None,
+        "compressors": CODECS["blosc_blosclz"]["compressors"] if compress else None,
+        "chunk_key_encoding": {"name": "default", "separator": "/"},
+    }
+    if codec is not None:
+        kwargs.update({"filters": None, "compressors": None, **CODECS[codec]})
+    return kwargs
+
+def block_values(block_slice) -> np.ndarray:
+    """Compute a block of the benchmark array.
+
+    Vectorised equivalent of the original row-by-row generator
+      np.fromfunction(lambda x: (x + y**2 / 32 + z**3) % 65536, ...).astype(np.uint16)
+    which is exact in float64 for this shape, so it reduces to (x + y**2 // 32 + z**3) mod 2**16.
+    The sum of the uint16 terms wraps modulo 2**16.
+    """
+    z = np.arange(block_slice[0].start, block_slice[0].stop, dtype=np.int64)
+    y = np.arange(block_slice[1].start, block_slice[1].stop, dtype=np.int64)
+    x = np.arange(block_slice[2].start, block_slice[2].stop, dtype=np.int64)
+    z_term = (z**3 % 65536).astype(np.uint16)
+    y_term = (y**2 // 32 % 65536).astype(np.uint16)
+    x_term = (x % 65536).astype(np.uint16)
+    return z_term[:, None, None] + y_term[None, :, None] + x_term[None, None, :]
+
+def block_slices(shape, block_shape):
+    for block_index in np.ndindex(*[(s + b - 1) // b for s, b in zip(shape, block_shape)]):
+        yield tuple(slice(i * b, min((i + 1) * b, s)) for i, b, s in zip(block_index, block_shape, shape))
+
+_worker_arrays = []
+
+def _init_worker(output_paths):
+    global _worker_arrays
+    _worker_arrays = [zarr.open_array(output_path, mode="r+") for output_path in output_paths]
+
+def _write_block(block_slice):
+    data = block_values(block_slice)
+    for array in _worker_arrays:
+        array[block_slice] = data
+    return data.nbytes
 
 @click.command()
 @click.argument('output_path')
 @click.option('--shard', is_flag=True, show_default=True, default=False, help='Shard the array.')
 @click.option('--compress', is_flag=True, show_default=True, default=False, help='Compress the array.')
-def main(output_path, shard, compress):
-    args = [
-        'zarrs_binary2zarr',
-        '--data-type',
-        'uint16',
-        '--fill-value',
-        '0',
-        '--separator',
-        '/',
-        '--array-shape',
-        '1024,2048,2048',
-        '--chunk-shape',
-        '32,32,32' if shard else '256,256,256',
-        '--shard-shape' if shard else None,
-        '256,256,256' if shard else None,
-        '--bytes-to-bytes-codecs' if compress else None,
-        '[ { "name": "blosc", "configuration": { "cname": "blosclz", "clevel": 9, "shuffle": "bitshuffle", "typesize": 2, "blocksize": 0 } } ]' if compress else None,
-        output_path
+@click.option('--chunk_shape', type=str, default=None, callback=parse_shape, help='Override the (inner) chunk shape, e.g. 64,64,64.')
+@click.option('--shard_shape', type=str, default=None, callback=parse_shape, help='Override the shard shape, e.g. 512,512,512. Implies --shard.')
+@click.option('--codec', type=click.Choice(list(CODECS)), default=None, help='A named codec configuration. Overrides --compress.')
+@click.option('--all', 'all_layouts', is_flag=True, show_default=True, default=False, help='Write every layout in LAYOUTS to the OUTPUT_PATH directory in one pass.')
+@click.option('--sweep', is_flag=True, show_default=True, default=False, help='Write every layout in SWEEP_LAYOUTS to the OUTPUT_PATH directory in one pass.')
+@click.option('--codec_matrix', is_flag=True, show_default=True, default=False, help='Write every layout in CODEC_LAYOUTS to the OUTPUT_PATH directory in one pass.')
+@click.option('--scaling', is_flag=True, show_default=True, default=False, help='Write every layout in SCALING_LAYOUTS to the OUTPUT_PATH directory.')
+@click.option('--scale', type=float, default=1.0, show_default=True, help='Scale the size of the array(s), e.g. 0.125 for 1GB instead of 8GB.')
+@click.option('--processes', type=int, default=None, help='Number of worker processes. Defaults to the number of CPUs.')
+def main(output_path, shard, compress, chunk_shape, shard_shape, codec, all_layouts, sweep, codec_matrix, scaling, scale, processes):
+    if all_layouts:
+        outputs = {os.path.join(output_path, name): array_kwargs(**layout, scale=scale) for name, layout in LAYOUTS.items()}
+    elif sweep:
+        outputs = {os.path.join(output_path, name): array_kwargs(**layout, scale=scale) for name, layout in SWEEP_LAYOUTS.items()}
+    elif codec_matrix:
+        outputs = {os.path.join(output_path, name): array_kwargs(**layout, scale=scale) for name, layout in CODEC_LAYOUTS.items()}
+    elif scaling:
+        outputs = {os.path.join(output_path, name): array_kwargs(**layout) for name, layout in SCALING_LAYOUTS.items()}
+    else:
+        outputs = {output_path: array_kwargs(shard=shard or shard_shape is not None, compress=compress, chunk_shape=chunk_shape, shard_shape=shard_shape, codec=codec, scale=scale)}
+
+    for path, kwargs in outputs.items():
+        print("Creating", path, kwargs["shape"])
+        zarr.create_array(path, overwrite=True, **kwargs)
+
+    start_time = timeit.default_timer()
+    # Outputs of the same shape are written in one pass
+    for shape in sorted({tuple(kwargs["shape"]) for kwargs in outputs.values()}):
+        write_outputs(shape, {path: kwargs for path, kwargs in outputs.items() if tuple(kwargs["shape"]) == shape}, processes)
+
+    elapsed = timeit.default_timer() - start_time
+    print(f"Generated in {elapsed:.2f}s")
+
+def write_outputs(shape, outputs: dict, processes):
+    # Every block is computed once and written to each output, so it must align with every shard/chunk grid
+    block_shape = [
+        min(math.lcm(*[(kwargs["shards"] or kwargs["chunks"])[i] for kwargs in outputs.values()]), shape[i])
+        for i in range(len(shape))
     ]
-    args = [arg for arg in args if arg is not None]
-
-    p = subprocess.Popen(args, stdin=subprocess.PIPE)
-    shape = [1024, 2048, 2048]
-    bytes_per_element = 2
-
-    # Write random bytes
-    # def write_data():
-    #     import random
-    #     random.seed(123)
-    #     n_bytes = reduce(mul, shape, 1) * bytes_per_element
-    #     while n_bytes > 0:
-    #         n = min(n_bytes, 1024)
-    #         p.stdin.write(random.randbytes(n))
-    #         n_bytes -= n
-
-    # Write a function
-    def write_data():
-        for z in range(shape[0]):
-            for y in range(shape[1]):
-                elements = np.fromfunction(lambda x: (x + y**2 / 32 + z**3) % 65536, shape=(shape[2],), dtype=np.uint16).astype(np.uint16)
-                p.stdin.write(elements.tobytes())
-
-    write_data()
-    p.stdin.close()
-    p.wait()
+    blocks = list(block_slices(shape, block_shape))
+    print("Block shape", block_shape)
+    print("Number of blocks", len(blocks))
+
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(list(outputs),)) as pool:
+        for i, _ in enumerate(pool.imap_unordered(_write_block, blocks)):
+            print(f"\rWritten {i + 1}/{len(blocks)} blocks", end="", flush=True)
+    print()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
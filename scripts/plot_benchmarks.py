@@ -2,18 +2,26 @@
 
 import matplotlib.pyplot as plt
 import pandas as pd
+import math
+import os
 from matplotlib.lines import Line2D
 import subprocess
 import re
 from importlib.metadata import version
 
+import numcodecs
 import zarr
 import zarrs
 import dask
 import tensorstore
 
+from calibrate_roofline import CEILINGS, ROOFLINE_CSV
+from generate_benchmark_array import SCALING_LAYOUTS, SWEEP_LAYOUTS, scaled_shape
+
 plt.rcParams['svg.hashsalt'] = 'deterministic'
 
+RUNS_CSV = "measurements/benchmark_runs.csv"
+
 LEGEND_COLS = 2
 YMAX_READ_ALL = 4
 YMAX_READ_ALL_DASK = 40
@@ -39,10 +47,15 @@ else:
 IMPLEMENTATIONS = {
     "zarrs_rust": f"LDeakin/zarrs ({zarrs_ver})",
     "tensorstore_python": f"google/tensorstore ({tensorstore.__version__})",
+    "tensorstore_python_pipelined": f"google/tensorstore ({tensorstore.__version__}) pipelined",
     "zarr_python": f"zarr-developers/zarr-python ({zarr.__version__})",
     "zarrs_python": f"zarr-developers/zarr-python ({zarr.__version__}) \n + ilan-gold/zarrs-python ({zarrs.__version__}) ZarrsCodecPipeline",
+    "zarr_python_index_cache": f"zarr-developers/zarr-python ({zarr.__version__}) + shard index cache",
+    "zarr_python_streaming": f"zarr-developers/zarr-python ({zarr.__version__}) streaming by shard",
+    "zarrs_python_streaming": f"zarr-developers/zarr-python ({zarr.__version__}) \n + ilan-gold/zarrs-python ({zarrs.__version__}) streaming by shard",
     "zarr_dask_python": "Default BatchedCodecPipeline",
     "zarrs_dask_python": f"ZarrsCodecPipeline via ilan-gold/zarrs-python ({zarrs.__version__})",
+    "reference_python": f"Reference: thread pool + zarr-developers/numcodecs ({numcodecs.__version__})",
 }
 
 IMAGES = {
@@ -58,22 +71,58 @@ plt.rcParams.update({
     # "axes.autolimit_mode": "round_numbers",
 })
 
-def custom_bar_label(ax, padding=5, rotation=90):
+# The ceilings drawn over each group of bars, as the minimum elapsed time they allow
+ROOFLINE_CEILINGS = {
+    "disk_parallel_gbps": "--",
+    "memcpy_parallel_gbps": ":",
+    "decode_parallel_gbps": "-.",
+}
+
+def load_roofline() -> pd.DataFrame | None:
+    """The ceilings measured by calibrate_roofline.py, or None if it has not been run."""
+    if not os.path.exists(ROOFLINE_CSV):
+        print("No roofline calibration, run scripts/calibrate_roofline.py")
+        return None
+    return pd.read_csv(ROOFLINE_CSV, index_col=0)
+
+def plot_ceilings(ax, roofline: pd.DataFrame | None, images: list[str], width=0.5) -> list[float] | None:
+    """Draw the ceilings of each image over its group of bars (at x = 0, 1, ...) as the minimum elapsed time they allow.
+
+    Returns the minimum elapsed time of each image (that of its lowest ceiling), or None without a calibration.
+    """
+    if roofline is None or not all(image in roofline.index for image in images):
+        return None
+    roofline = roofline.loc[images]
+    for ceiling, ls in ROOFLINE_CEILINGS.items():
+        times = roofline["decoded_gb"] / roofline[ceiling]
+        ax.hlines(times, [x - width / 2 for x in range(len(images))], [x + width / 2 for x in range(len(images))], color='k', ls=ls, lw=1, zorder=3, label=CEILINGS[ceiling])
+    return list((roofline["decoded_gb"] / roofline[list(ROOFLINE_CEILINGS)].min(axis=1)).values)
+
+def ceiling_legend(fig):
+    custom_lines = [Line2D([0], [0], color='k', ls=ls, lw=1) for ls in ROOFLINE_CEILINGS.values()]
+    fig.legend(custom_lines, [CEILINGS[ceiling] for ceiling in ROOFLINE_CEILINGS], loc='outside lower center', ncol=len(ROOFLINE_CEILINGS), title="Ceiling", borderaxespad=0)
+
+def custom_bar_label(ax, padding=5, rotation=90, ceiling_times=None):
     """Adds labels to bars in a bar chart.
     
     Parameters:
         ax (matplotlib.axes.Axes): The axes containing the bars.
         padding (int): Padding for the labels.
         rotation (int): Rotation angle for the labels.
+        ceiling_times (list[float]): If set, also label each bar with its percentage of the ceiling of its group.
     """
     y_lim = ax.get_ylim()[1]  # Get the upper limit of the y-axis
+    percent = r"\%" if plt.rcParams["text.usetex"] else "%"
 
     for container in ax.containers:
-        for bar in container:
+        for group, bar in enumerate(container):
             height = bar.get_height()
             # Determine label position based on whether the bar exceeds y-axis limit
             label_position = min(height, y_lim)  # Use y_lim if height exceeds it
-            ax.annotate(f'{height:.3g}', 
+            label = f'{height:.3g}'
+            if ceiling_times is not None:
+                label += f' ({ceiling_times[group] / height * 100:.0f}{percent})'
+            ax.annotate(label, 
                         xy=(bar.get_x() + bar.get_width() / 2, label_position),
                         xytext=(0, padding),
                         textcoords="offset points",
@@ -84,6 +133,7 @@ def custom_bar_label(ax, padding=5, rotation=90):
 
 def plot_read_all(plot_dask: bool, ymax: float):
     df = pd.read_csv("measurements/benchmark_read_all.csv", header=[0, 1], index_col=0)
+    images = list(df.index)
     df.index = ["Uncompressed", "Compressed", "Compressed\n+ Sharded"]
 
     if plot_dask:
@@ -121,7 +171,10 @@ def plot_read_all(plot_dask: bool, ymax: float):
     ax_mem.spines['top'].set_visible(False)
     ax_mem.spines['right'].set_visible(False)
 
-    custom_bar_label(ax_time)
+    ceiling_times = plot_ceilings(ax_time, load_roofline(), images)
+    if ceiling_times is not None:
+        ceiling_legend(fig)
+    custom_bar_label(ax_time, ceiling_times=ceiling_times)
     custom_bar_label(ax_mem)
 
     ax_time.get_legend().remove()
@@ -160,6 +213,13 @@ def plot_read_chunks(plot_dask: bool):
         row.plot(x="Concurrency", y="Time (s)", ax=ax_time, color=cmap, ls=image_ls[image])
         row.plot(x="Concurrency", y="Memory (GB)", ax=ax_mem, color=cmap, ls=image_ls[image])
 
+    # The minimum elapsed time of each image (its lowest ceiling)
+    roofline = load_roofline()
+    if roofline is not None:
+        for image, ls in image_ls.items():
+            if image in roofline.index:
+                ax_time.axhline(roofline.loc[image, "decoded_gb"] / roofline.loc[image, list(ROOFLINE_CEILINGS)].min(), color='gray', ls=ls, lw=1)
+
     # Custom legend
     custom_lines = [Line2D([0], [0], color=cmap[i]) for i in range(len(implementations))]
     title = f"dask/dask ({dask.__version__}) + zarr-developers/zarr-python ({zarr.__version__})" if plot_dask else "Zarr V3 Implementation"
@@ -249,12 +309,425 @@ def plot_roundtrip(plot_dask: bool, ymax: float):
     fig.savefig(f"plots/benchmark_roundtrip{'_dask' if plot_dask else ''}.svg", metadata={'Date': None, 'Creator': None})
     # fig.savefig(f"plots/benchmark_roundtrip{'_dask' if plot_dask else ''}.pdf", metadata={'Date': None, 'Creator': None})
 
+def plot_scaling(benchmark: str, plot_dask: bool):
+    """Plot time and peak memory against dataset size, on log-log axes so linear scaling has a slope of 1."""
+    path = f"measurements/benchmark_{benchmark}.csv"
+    if not os.path.exists(path):
+        print(f"No summary for {benchmark}")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=0)
+    df = df.loc[:, df.columns.get_level_values(1).str.contains("dask") == plot_dask]
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in df.columns.get_level_values(1)]
+    sizes_gb = {
+        f"data/scaling/{name}": math.prod(scaled_shape(layout["scale"])) * 2 / 1.0e9
+        for name, layout in SCALING_LAYOUTS.items()
+    }
+    sizes_gb = {image: size for image, size in sizes_gb.items() if image in df.index}
+    print(df)
+
+    fig = plt.figure(figsize=(9, 4), layout="constrained")
+    spec = fig.add_gridspec(2, 2)
+    ax_time = fig.add_subplot(spec[:, 0])
+    ax_mem = fig.add_subplot(spec[:, 1])
+
+    cmap = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    for i, implementation in enumerate(implementations):
+        ax_time.plot(list(sizes_gb.values()), df.loc[list(sizes_gb), ("Time (s)", implementation)], color=cmap[i], marker='o')
+        ax_mem.plot(list(sizes_gb.values()), df.loc[list(sizes_gb), ("Memory (GB)", implementation)], color=cmap[i], marker='o')
+    # The dataset size, the ideal peak memory usage of reading it all at once
+    ax_mem.plot(list(sizes_gb.values()), list(sizes_gb.values()), color='k', ls=':', lw=1)
+
+    custom_lines = [Line2D([0], [0], color=cmap[i]) for i in range(len(implementations))]
+    title = f"dask/dask ({dask.__version__}) + zarr-developers/zarr-python ({zarr.__version__})" if plot_dask else "Zarr V3 Implementation"
+    fig.legend(custom_lines, [IMPLEMENTATIONS[implementation] for implementation in implementations], loc="outside upper center", ncol=LEGEND_COLS, title=title, borderaxespad=0)
+
+    for ax in (ax_time, ax_mem):
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel("Dataset size (GB)")
+        ax.grid(True, which='both')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    ax_time.set_ylabel("Elapsed time (s)")
+    ax_mem.set_ylabel("Peak memory usage (GB)")
+
+    fig.savefig(f"plots/benchmark_{benchmark}{'_dask' if plot_dask else ''}.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_store(benchmark: str):
+    """Plot time on the filesystem against in memory, side by side for each implementation and image."""
+    path = f"measurements/benchmark_{benchmark}.csv"
+    if not os.path.exists(path):
+        print(f"No summary for {benchmark}")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=[0, 1])["Time (s)"]
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in df.columns]
+    print(df)
+
+    fig, axes = plt.subplots(1, len(IMAGES), figsize=(9, 4), layout="constrained", sharey=True, squeeze=False)
+    for ax, (image, image_label) in zip(axes[0], IMAGES.items()):
+        df.loc[image, implementations].T.plot(kind='bar', ax=ax, legend=False, color=["tab:gray", "tab:orange"])
+        ax.set_title(image_label.replace("\n", " "))
+        ax.set_xticks(range(len(implementations)), [str(i + 1) for i in range(len(implementations))], rotation=0)
+        ax.set_xlabel("Implementation")
+        ax.grid(True, which='both', axis='y')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    axes[0, 0].set_ylabel("Elapsed time (s)")
+
+    handles, labels = axes[0, 0].get_legend_handles_labels()
+    fig.legend(handles, ["Filesystem" if label == "local" else "Memory" for label in labels], loc='outside upper right', title="Store", borderaxespad=0)
+    labels = [f"{i + 1}: {implementation.replace('_', ' ')}" for i, implementation in enumerate(implementations)]
+    fig.legend([Line2D([], [], ls="")] * len(labels), labels, loc='outside upper left', ncol=2, title="Implementation", borderaxespad=0)
+
+    fig.savefig(f"plots/benchmark_{benchmark}.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_warm_read():
+    """Plot the time of a warm pass and peak memory usage against the cache size, with the page cache kept (solid) or evicted (dashed)."""
+    path = "measurements/benchmark_warm_read.csv"
+    if not os.path.exists(path):
+        print("No summary for warm_read")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=[0, 1])
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in df.columns.get_level_values(1)]
+    print(df)
+
+    fig, axes = plt.subplots(2, len(IMAGES), figsize=(9, 6), layout="constrained", sharex=True, sharey='row', squeeze=False)
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    for column, (image, image_label) in enumerate(IMAGES.items()):
+        if image not in df.index:
+            continue
+        df_image = df.loc[image]
+        cache_gb = df_image.index / 1.0e9
+        for (ax, metric) in zip(axes[:, column], ["Warm pass (s)", "Memory (GB)"]):
+            for color, implementation in zip(colors, implementations):
+                ax.plot(cache_gb, df_image[(metric, implementation)], color=color, marker='o')
+                ax.plot(cache_gb, df_image[(metric, f"{implementation}_evict")], color=color, marker='o', linestyle='--')
+            ax.set_xscale('symlog', linthresh=1)
+            ax.set_xticks(cache_gb, [f"{size:g}" for size in cache_gb])
+            ax.set_ylim(ymin=0)
+            ax.grid(True, which='both', axis='y')
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+        axes[0, column].set_title(image_label.replace("\n", " "))
+        axes[1, column].set_xlabel("Cache size (GB)")
+    axes[0, 0].set_ylabel("Time per warm pass (s)")
+    axes[1, 0].set_ylabel("Peak memory usage (GB)")
+
+    custom_lines = [Line2D([0], [0], color=color, marker='o') for color in colors[:len(implementations)]]
+    custom_lines += [Line2D([0], [0], color="black"), Line2D([0], [0], color="black", linestyle='--')]
+    labels = [IMPLEMENTATIONS[implementation] for implementation in implementations] + ["Page cache kept", "Page cache evicted"]
+    fig.legend(custom_lines, labels, loc='outside upper center', ncol=LEGEND_COLS, title="Zarr V3 Implementation (4 passes of 64 boxes)", borderaxespad=0)
+
+    fig.savefig("plots/benchmark_warm_read.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_inner_chunks():
+    """Plot the time to read every inner chunk of the sharded dataset one by one, for each concurrency."""
+    path = "measurements/benchmark_read_inner_chunks.csv"
+    if not os.path.exists(path):
+        print("No summary for read_inner_chunks")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=[0, 1])["Time (s)"].droplevel(0)
+    df.rename(columns=IMPLEMENTATIONS, inplace=True)
+    print(df)
+
+    fig, ax = plt.subplots(figsize=(9, 4), layout="constrained")
+    df.plot(kind='bar', ax=ax)
+    ax.set_xlabel("Concurrent chunks")
+    ax.set_ylabel("Elapsed time (s)")
+    ax.tick_params(axis='x', labelrotation=0)
+    ax.grid(True, which='both', axis='y')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    custom_bar_label(ax)
+    fig.legend(loc='outside upper center', ncol=LEGEND_COLS, title="Zarr V3 Implementation (inner chunks of Compressed + Sharded)", borderaxespad=0)
+    ax.get_legend().remove()
+
+    fig.savefig("plots/benchmark_read_inner_chunks.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_codec_pareto():
+    """Plot compression ratio against decode (read all) and round trip throughput for each codec and implementation."""
+    paths = {benchmark: f"measurements/benchmark_{benchmark}.csv" for benchmark in ["codec_read_all", "codec_roundtrip"]}
+    if not all(os.path.exists(path) for path in paths.values()):
+        print("No summary for codec_read_all and codec_roundtrip")
+        return
+    dfs = {benchmark: pd.read_csv(path, header=[0, 1], index_col=0) for benchmark, path in paths.items()}
+    # The compression ratio is a property of the dataset
+    compression_ratio = dfs["codec_read_all"]["Compression ratio"].mean(axis=1)
+    codecs = {image: os.path.splitext(os.path.basename(image))[0].replace("_", " ") for image in compression_ratio.index}
+
+    fig, axes = plt.subplots(1, 2, figsize=(9, 4.5), layout="constrained", sharey=True)
+    cmap = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in dfs["codec_read_all"]["Throughput (GB/s)"].columns]
+    for ax, (benchmark, df), xlabel in zip(axes, dfs.items(), ["Decode throughput (GB/s)", "Round trip throughput (GB/s)"]):
+        points = []
+        for i, implementation in enumerate(implementations):
+            if implementation not in df["Throughput (GB/s)"]:
+                continue
+            throughput = df["Throughput (GB/s)"][implementation]
+            ax.scatter(throughput, compression_ratio[throughput.index], color=cmap[i], s=12)
+            points += [(throughput[image], compression_ratio[image]) for image in throughput.index if pd.notna(throughput[image])]
+        for image, codec in codecs.items():
+            best = df["Throughput (GB/s)"].loc[image].max()
+            if pd.notna(best):
+                ax.annotate(codec, (best, compression_ratio[image]), xytext=(3, 0), textcoords="offset points", fontsize="x-small", va="center")
+
+        # Pareto front: points with no other point both faster and better compressed
+        front = sorted(
+            (point for point in points if not any(other[0] > point[0] and other[1] > point[1] for other in points)),
+            reverse=True,
+        )
+        ax.plot([point[0] for point in front], [point[1] for point in front], color="k", ls=":", lw=1, drawstyle="steps-post")
+
+        ax.set_xlabel(xlabel)
+        ax.set_xlim(xmin=0)
+        ax.set_yscale('log')
+        ax.grid(True, which='both')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    axes[0].set_ylabel("Compression ratio")
+
+    custom_lines = [Line2D([0], [0], color=cmap[i], marker='o', ls="") for i in range(len(implementations))]
+    fig.legend(custom_lines, [f"dask/dask ({dask.__version__}) + {IMPLEMENTATIONS[implementation]}" if "dask" in implementation else IMPLEMENTATIONS[implementation] for implementation in implementations], loc='outside upper center', ncol=LEGEND_COLS, title="Implementation", borderaxespad=0)
+
+    fig.savefig("plots/benchmark_codec_pareto.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_startup():
+    path = "measurements/benchmark_startup.csv"
+    if not os.path.exists(path):
+        print("No summary for startup")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=0)
+    df.rename(index=IMAGES, level=0, inplace=True)
+    df.rename(level=1, columns={
+        implementation: f"dask/dask ({dask.__version__}) + {label}" if "dask" in implementation else label
+        for implementation, label in IMPLEMENTATIONS.items()
+    }, inplace=True)
+    components = ["Start-up (s)", "Import (s)", "Registration (s)", "Open (s)"]
+    print(df)
+
+    fig, axes = plt.subplots(1, len(df.index), figsize=(9, 4), layout="constrained", sharey=True, squeeze=False)
+    for ax, (image, row) in zip(axes[0], df.iterrows()):
+        row[components].unstack(level=0).reindex(row["Time (s)"].index)[components].plot(kind='bar', stacked=True, ax=ax, legend=False)
+        ax.set_title(image.replace("\n", " "))
+        ax.set_xticks(range(len(row["Time (s)"])), [str(i + 1) for i in range(len(row["Time (s)"]))], rotation=0)
+        ax.set_xlabel("Implementation")
+        ax.grid(True, which='both', axis='y')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    axes[0, 0].set_ylabel("Elapsed time (s)")
+
+    handles, labels = axes[0, 0].get_legend_handles_labels()
+    implementations = [f"{i + 1}: {implementation}" for i, implementation in enumerate(df["Time (s)"].columns)]
+    fig.legend(handles, [label.replace(" (s)", "") for label in labels], loc='outside upper right', title="Component", borderaxespad=0)
+    fig.legend([Line2D([], [], ls="")] * len(implementations), implementations, loc='outside upper left', title="Implementation", borderaxespad=0)
+
+    fig.savefig("plots/benchmark_startup.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_traces(benchmark: str, plot_dask: bool):
+    """Plot the memory and CPU timelines sampled from the fastest repetition of each implementation/image."""
+    runs = pd.read_csv(RUNS_CSV) if os.path.exists(RUNS_CSV) else pd.DataFrame()
+    if "trace" not in runs:
+        print(f"No traces for {benchmark}")
+        return
+    runs = runs[(runs["benchmark"] == benchmark) & runs["trace"].notna()]
+    if plot_dask:
+        runs = runs[runs["implementation"].str.contains("dask")]
+    else:
+        runs = runs[~runs["implementation"].str.contains("dask")]
+    if runs.empty:
+        print(f"No traces for {benchmark}")
+        return
+    runs = runs.loc[runs.groupby(["image", "implementation"])["wall_time_s"].idxmin()]
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in runs["implementation"].values]
+
+    fig, axes = plt.subplots(2, len(IMAGES), figsize=(9, 5), layout="constrained", sharex="col", sharey="row", squeeze=False)
+    cmap = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    for column, (image, image_label) in enumerate(IMAGES.items()):
+        ax_mem, ax_cpu = axes[0, column], axes[1, column]
+        for i, implementation in enumerate(implementations):
+            run = runs[(runs["image"] == image) & (runs["implementation"] == implementation)]
+            if run.empty:
+                continue
+            trace = pd.read_csv(run["trace"].iloc[0])
+            rss_gb = trace.groupby(["time_s", "pid"])["rss_gb"].first().groupby("time_s").sum()
+            cpu = trace.groupby("time_s")["cpu"].sum()
+            ax_mem.plot(rss_gb.index, rss_gb.values, color=cmap[i], label=IMPLEMENTATIONS[implementation])
+            ax_cpu.plot(cpu.index, cpu.values, color=cmap[i])
+        ax_mem.set_title(image_label.replace("\n", " "))
+        ax_cpu.set_xlabel("Elapsed time (s)")
+        for ax in (ax_mem, ax_cpu):
+            ax.set_xlim(xmin=0)
+            ax.set_ylim(ymin=0)
+            ax.grid(True, which='both', axis='y')
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+    axes[0, 0].set_ylabel("Memory usage (GB)")
+    axes[1, 0].set_ylabel("CPU utilisation (cores)")
+
+    title = f"dask/dask ({dask.__version__}) + zarr-developers/zarr-python ({zarr.__version__})" if plot_dask else "Zarr V3 Implementation"
+    custom_lines = [Line2D([0], [0], color=cmap[i]) for i in range(len(implementations))]
+    fig.legend(custom_lines, [IMPLEMENTATIONS[implementation] for implementation in implementations], loc='outside upper center', ncol=LEGEND_COLS, title=title, borderaxespad=0)
+
+    fig.savefig(f"plots/benchmark_{benchmark}_trace{'_dask' if plot_dask else ''}.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_chunk_latency_cdf(plot_dask: bool):
+    """Plot the CDF of per-chunk read latencies at each concurrency of the chunk-by-chunk benchmark."""
+    runs = pd.read_csv(RUNS_CSV) if os.path.exists(RUNS_CSV) else pd.DataFrame()
+    if "chunk_latencies" not in runs:
+        print("No chunk latencies for read_chunks")
+        return
+    runs = runs[(runs["benchmark"] == "read_chunks") & runs["chunk_latencies"].notna()]
+    if plot_dask:
+        runs = runs[runs["implementation"].str.contains("dask")]
+    else:
+        runs = runs[~runs["implementation"].str.contains("dask")]
+    if runs.empty:
+        print("No chunk latencies for read_chunks")
+        return
+    runs = runs.loc[runs.groupby(["image", "implementation", "concurrency"])["wall_time_s"].idxmin()]
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in runs["implementation"].values]
+    concurrencies = sorted(runs["concurrency"].unique())
+    colors = plt.cm.viridis([i / max(len(concurrencies) - 1, 1) for i in range(len(concurrencies))])
+
+    fig, axes = plt.subplots(len(implementations), len(IMAGES), figsize=(9, 2 * len(implementations) + 1), layout="constrained", sharex=True, sharey=True, squeeze=False)
+    for row, implementation in enumerate(implementations):
+        for column, (image, image_label) in enumerate(IMAGES.items()):
+            ax = axes[row, column]
+            for concurrency, color in zip(concurrencies, colors):
+                run = runs[(runs["image"] == image) & (runs["implementation"] == implementation) & (runs["concurrency"] == concurrency)]
+                if run.empty:
+                    continue
+                latencies_s = pd.read_csv(run["chunk_latencies"].iloc[0])["latency_s"].sort_values()
+                ax.step(latencies_s.values, [(i + 1) / len(latencies_s) for i in range(len(latencies_s))], where="post", color=color)
+            if row == 0:
+                ax.set_title(image_label.replace("\n", " "))
+            if column == 0:
+                ax.set_ylabel(implementation.replace("_", " ") + "\nCDF")
+            if row == len(implementations) - 1:
+                ax.set_xlabel("Chunk latency (s)")
+            ax.set_xscale('log')
+            ax.set_ylim(0, 1)
+            ax.axhline(0.99, color='k', lw=0.5, ls=':')
+            ax.grid(True, which='major')
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+
+    custom_lines = [Line2D([0], [0], color=color) for color in colors]
+    fig.legend(custom_lines, [str(concurrency) for concurrency in concurrencies], loc='outside upper center', ncol=len(concurrencies), title="Concurrent chunks", borderaxespad=0)
+
+    fig.savefig(f"plots/benchmark_read_chunks_latency{'_dask' if plot_dask else ''}.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_scheduler():
+    path = "measurements/benchmark_scheduler.csv"
+    if not os.path.exists(path):
+        print("No summary for scheduler")
+        return
+    df = pd.read_csv(path, header=[0, 1], index_col=[0, 1, 2])
+    df = df.reset_index(level=[1, 2])
+    print(df)
+
+    fig = plt.figure(figsize=(9, 4), layout="constrained")
+    spec = fig.add_gridspec(2, 2)
+    ax_overhead = fig.add_subplot(spec[:, 0])
+    ax_mem = fig.add_subplot(spec[:, 1])
+
+    schedulers = df["Time (s)"].columns
+    df.plot(x="Chunks", y="Overhead per chunk (us)", ax=ax_overhead, marker='o')
+    df.plot(x="Chunks", y="Memory (GB)", ax=ax_mem, marker='o')
+    ax_overhead.get_legend().remove()
+    ax_mem.get_legend().remove()
+    custom_lines = [Line2D([0], [0], color=color, marker='o') for color in plt.rcParams['axes.prop_cycle'].by_key()['color'][:len(schedulers)]]
+    fig.legend(custom_lines, schedulers, loc='outside upper center', ncol=len(schedulers), title=f"Scheduler ({df['Concurrency'].iloc[0]} requests in flight)", borderaxespad=0)
+
+    for ax in (ax_overhead, ax_mem):
+        ax.set_xscale('log', base=2)
+        ax.set_xlabel("Chunks")
+        ax.set_ylim(ymin=0)
+        ax.grid(True, which='both', axis='y')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    ax_overhead.set_ylabel("Overhead per chunk (us)")
+    ax_mem.set_ylabel("Peak memory usage (GB)")
+
+    fig.savefig("plots/benchmark_scheduler.svg", metadata={'Date': None, 'Creator': None})
+
+def plot_sweep(benchmark: str, plot_dask: bool):
+    """Plot time and memory against the (inner) chunk size of each chunk/shard shape variant."""
+    path = f"measurements/benchmark_{benchmark}.csv"
+    if not os.path.exists(path):
+        print(f"No summary for {benchmark}")
+        return
+    if benchmark == "sweep_read_chunks":
+        # A single concurrency
+        df = pd.read_csv(path, header=[0, 1], index_col=[0, 1]).droplevel(1)
+    else:
+        df = pd.read_csv(path, header=[0, 1], index_col=0)
+    df = df.loc[:, df.columns.get_level_values(1).str.contains("dask") == plot_dask]
+    implementations = [implementation for implementation in IMPLEMENTATIONS if implementation in df.columns.get_level_values(1)]
+    print(df)
+
+    fig = plt.figure(figsize=(9, 4), layout="constrained")
+    spec = fig.add_gridspec(2, 2)
+    ax_time = fig.add_subplot(spec[:, 0])
+    ax_mem = fig.add_subplot(spec[:, 1])
+
+    cmap = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    shard_ls = {None: "-", 256: "--", 512: ":"}
+    for shard_size, ls in shard_ls.items():
+        # The variants with this shard size (or unsharded), ordered by chunk size
+        layouts = {
+            f"data/sweep/{name}": math.prod(layout["chunk_shape"]) * 2 / 1.0e6
+            for name, layout in SWEEP_LAYOUTS.items()
+            if (layout.get("shard_shape") or [None])[0] == shard_size
+        }
+        layouts = {image: size for image, size in sorted(layouts.items(), key=lambda item: item[1]) if image in df.index}
+        for i, implementation in enumerate(implementations):
+            ax_time.plot(list(layouts.values()), df.loc[list(layouts), ("Time (s)", implementation)], color=cmap[i], ls=ls, marker='o')
+            ax_mem.plot(list(layouts.values()), df.loc[list(layouts), ("Memory (GB)", implementation)], color=cmap[i], ls=ls, marker='o')
+
+    custom_lines = [Line2D([0], [0], color=cmap[i]) for i in range(len(implementations))]
+    title = f"dask/dask ({dask.__version__}) + zarr-developers/zarr-python ({zarr.__version__})" if plot_dask else "Zarr V3 Implementation"
+    fig.legend(custom_lines, [IMPLEMENTATIONS[implementation] for implementation in implementations], loc="outside upper left", ncol=2, title=title, borderaxespad=0)
+    custom_lines = [Line2D([0], [0], color='k', ls=ls) for ls in shard_ls.values()]
+    fig.legend(custom_lines, ["Unsharded", "$256^3$ shards", "$512^3$ shards"], loc="outside upper right", title="Dataset", borderaxespad=0)
+
+    for ax in (ax_time, ax_mem):
+        ax.set_xscale('log', base=2)
+        ax.set_xlabel("Chunk size (MB)")
+        ax.set_ylim(ymin=0)
+        ax.grid(True, which='both', axis='y')
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+    ax_time.set_ylabel("Elapsed time (s)")
+    ax_mem.set_ylabel("Peak memory usage (GB)")
+
+    fig.savefig(f"plots/benchmark_{benchmark}{'_dask' if plot_dask else ''}.svg", metadata={'Date': None, 'Creator': None})
+
 if __name__ == "__main__":
     plot_read_all(plot_dask=False, ymax=YMAX_READ_ALL)
     plot_read_all(plot_dask=True, ymax=YMAX_READ_ALL_DASK)
     plot_read_chunks(plot_dask=False)
     plot_read_chunks(plot_dask=True)
+    plot_chunk_latency_cdf(plot_dask=False)
+    plot_chunk_latency_cdf(plot_dask=True)
     plot_roundtrip(plot_dask=False, ymax=YMAX_ROUNDTRIP)
     plot_roundtrip(plot_dask=True, ymax=YMAX_ROUNDTRIP_DASK)
+    for benchmark in ["sweep_read_all", "sweep_read_chunks", "sweep_roundtrip"]:
+        plot_sweep(benchmark, plot_dask=False)
+        plot_sweep(benchmark, plot_dask=True)
+    for benchmark in ["scaling_read_all", "scaling_roundtrip"]:
+        plot_scaling(benchmark, plot_dask=False)
+        plot_scaling(benchmark, plot_dask=True)
+    plot_codec_pareto()
+    plot_inner_chunks()
+    plot_warm_read()
+    plot_store("store_read_all")
+    plot_store("store_roundtrip")
+    plot_startup()
+    plot_scheduler()
+    plot_traces("read_all", plot_dask=False)
+    plot_traces("read_all", plot_dask=True)
+    plot_traces("roundtrip", plot_dask=False)
+    plot_traces("roundtrip", plot_dask=True)
 
 plt.show()
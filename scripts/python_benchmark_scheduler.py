@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import asyncio
+import click
+from functools import wraps
+
+import numpy as np
+
+from _telemetry import Telemetry
+from _scheduler import SCHEDULERS
+
+def coro(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(f(*args, **kwargs))
+
+    return wrapper
+
+@click.command()
+@coro
+@click.argument('scheduler', type=click.Choice(list(SCHEDULERS)))
+@click.option('--chunks', type=int, default=131072, show_default=True, help='Number of synthetic chunk requests.')
+@click.option('--concurrent_chunks', type=int, default=32, show_default=True, help='Maximum number of requests in flight (ignored by taskgroup).')
+@click.option('--latency_s', type=float, default=0.0, show_default=True, help='Simulated latency of each request.')
+async def main(scheduler, chunks, concurrent_chunks, latency_s):
+    """Measure the overhead of scheduling chunk requests that do no work (other than awaiting --latency_s)."""
+    telemetry = Telemetry()
+
+    async def chunk_read(chunk_index):
+        await asyncio.sleep(latency_s)
+
+    # The chunk indices of a cube-ish grid, generated lazily like those of the read scripts
+    grid = [int(np.ceil(chunks ** (1 / 3)))] * 2
+    grid = [-(-chunks // (grid[0] * grid[1]))] + grid
+    chunk_indices = (chunk_index for _, chunk_index in zip(range(chunks), np.ndindex(*grid)))
+
+    telemetry.opened()
+    await SCHEDULERS[scheduler](chunk_read, chunk_indices, concurrent_chunks)
+    telemetry.array_read(0, chunks)
+    telemetry.finished()
+
+    telemetry.extra["overhead_us_per_chunk"] = telemetry.elapsed_s / chunks * 1.0e6
+    print(f"Scheduled {chunks} chunks in {telemetry.elapsed_s * 1000.0:.2f}ms ({telemetry.extra['overhead_us_per_chunk']:.2f}us per chunk)")
+    telemetry.emit()
+
+if __name__ == "__main__":
+    asyncio.run(main())
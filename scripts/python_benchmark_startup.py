@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import timeit
+import click
+
+from _telemetry import Telemetry
+
+# Only lightweight modules are imported above (_telemetry imports numpy lazily), each implementation is imported and timed in main
+
+IMPLEMENTATIONS = [
+    "tensorstore_python",
+    "zarr_python",
+    "zarrs_python",
+    "zarr_dask_python",
+    "zarrs_dask_python",
+]
+
+def import_implementation(implementation):
+    if implementation == "tensorstore_python":
+        import tensorstore
+    if "zarr" in implementation:
+        import zarr
+    if "zarrs" in implementation:
+        import zarrs
+    if "dask" in implementation:
+        import dask.array
+
+def register_codec_pipeline(implementation, path):
+    """Configure the codec pipeline of zarr-python, then resolve and build it for the codecs of the array at path.
+
+    Opening the array still builds its own pipeline, so array_open_s includes that too.
+    """
+    if implementation == "tensorstore_python":
+        return
+    import zarr
+    from zarr.core.array import create_codec_pipeline, parse_array_metadata
+    if implementation == "zarr_python":
+        zarr.config.set({
+            "async.concurrency": 10, # None is too much memory
+        })
+    elif implementation == "zarr_dask_python":
+        zarr.config.set({
+            "async.concurrency": None,
+        })
+    else:
+        zarr.config.set({
+            "threading.num_workers": None,
+            "array.write_empty_chunks": False,
+            "codec_pipeline": {
+                'batch_size': 1,
+                "path": "zarrs.ZarrsCodecPipeline",
+                "validate_checksums": True,
+                "store_empty_chunks": False,
+                "chunk_concurrent_minimum": 4,
+                "chunk_concurrent_maximum": None,
+            }
+        })
+    with open(os.path.join(path, "zarr.json")) as f:
+        return create_codec_pipeline(metadata=parse_array_metadata(json.load(f)))
+
+def open_array(implementation, path):
+    if implementation == "tensorstore_python":
+        import tensorstore as ts
+        return ts.open({
+            'driver': 'zarr3',
+            'kvstore': {
+                'driver': 'file',
+                'path': path,
+            },
+        }).result()
+    import zarr
+    from zarr.storage import LocalStore
+    if "dask" in implementation:
+        import dask.array as da
+        z = zarr.open_array(path)
+        return da.from_zarr(path, chunks=z.shards)
+    return zarr.open(store=LocalStore(path, read_only=True), mode='r')
+
+@click.command()
+@click.argument('implementation', type=click.Choice(IMPLEMENTATIONS))
+@click.argument('path', type=str)
+def main(implementation, path):
+    telemetry = Telemetry()
+
+    start_time = timeit.default_timer()
+    import_implementation(implementation)
+    import_time = timeit.default_timer()
+    register_codec_pipeline(implementation, path)
+    registration_time = timeit.default_timer()
+    dataset = open_array(implementation, path)
+    open_time = timeit.default_timer()
+    print(dataset.shape)
+
+    telemetry.opened()
+    telemetry.finished()
+    telemetry.extra = {
+        "import_s": import_time - start_time,
+        "registration_s": registration_time - import_time,
+        "array_open_s": open_time - registration_time,
+    }
+    print(f"Imported in {telemetry.extra['import_s'] * 1000.0:.2f}ms, registered codec pipeline in {telemetry.extra['registration_s'] * 1000.0:.2f}ms, opened in {telemetry.extra['array_open_s'] * 1000.0:.2f}ms")
+    telemetry.emit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import timeit
+import click
+import numpy as np
+
+from _telemetry import Telemetry
+from _stores import STORES
+from _buffers import TARGETS, allocate
+from _scheduler import run_bounded_threads
+from _access_trace import paced_threads, read_access_trace
+from _selections import chunk_bytes_decoded
+from _reference import DirectFiles, LocalFiles, MemoryFiles, MmapFiles, ReferenceArray
+
+@click.command()
+@click.argument('path', type=str)
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Read from the filesystem, or from a copy of the dataset loaded into memory before timing.')
+@click.option('--mmap', 'use_mmap', is_flag=True, show_default=True, default=False, help='Read the filesystem store through memory-mapped files, rather than reading them into buffers. Ignored with --store memory.')
+@click.option('--direct_io', is_flag=True, show_default=True, default=False, help='Read the filesystem store with O_DIRECT, bypassing the page cache (Linux, if the filesystem supports it). Ignored with --store memory or --mmap.')
+@click.option('--concurrent_chunks', type=int, default=None, help='Number of threads reading chunks (shards if sharded). Defaults to that of ThreadPoolExecutor. Ignored if --read-all is set')
+@click.option('--read_all', is_flag=True, show_default=True, default=False, help='Read the entire array into one array, from the default number of threads.')
+@click.option('--read_into', type=click.Choice(TARGETS), default=None, help='With --read_all, decode into one preallocated numpy (or memory-mapped temporary file) array.')
+@click.option('--access_trace', type=str, default=None, help='Replay the box reads of an access trace CSV (see generate_access_trace.py) instead of chunks, clipped to the array.')
+@click.option('--access_trace_realtime', is_flag=True, show_default=True, default=False, help='Start each --access_trace read no earlier than its time offset, rather than as soon as a read is free.')
+def main(path, store_type, use_mmap, direct_io, concurrent_chunks, read_all, read_into, access_trace, access_trace_realtime):
+    """A hand-rolled reader: whole chunk (or shard) files read from a pool of threads and decoded with numcodecs."""
+    telemetry = Telemetry()
+
+    if store_type == "memory":
+        files = MemoryFiles(path)
+        telemetry.syscall_reads = False
+        telemetry.extra["memory_store_bytes"] = files.nbytes
+    elif use_mmap:
+        files = MmapFiles(path)
+        telemetry.syscall_reads = False
+    elif direct_io:
+        files = DirectFiles(path)
+    else:
+        files = LocalFiles(path)
+
+    dataset = ReferenceArray.open(files, path)
+
+    print("Domain shape", dataset.shape)
+    print("Chunk shape", dataset.shard_shape)
+    print("Number of chunks", dataset.grid)
+
+    def chunk_read(chunk_index):
+        start_time = timeit.default_timer()
+        chunk = dataset.read_shard(chunk_index)
+        telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+
+    def selection_read(selection):
+        start_time = timeit.default_timer()
+        data = dataset.read_selection(selection)
+        telemetry.selection_read(data.nbytes, timeit.default_timer() - start_time)
+
+    if access_trace is not None:
+        trace_entries = read_access_trace(access_trace, dataset.shape)
+        telemetry.extra["chunk_bytes_decoded"] = chunk_bytes_decoded([selection for _, selection in trace_entries], dataset.shard_shape, dataset.dtype.itemsize)
+
+    telemetry.opened()
+    if read_all:
+        data = allocate(dataset.shape, dataset.dtype, read_into or "numpy")
+        run_bounded_threads(lambda chunk_index: dataset.read_into(chunk_index, data), dataset.shard_indices())
+        telemetry.array_read(data.nbytes, np.prod(dataset.grid).item())
+        telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+        print(data.shape)
+    elif access_trace is not None:
+        run_bounded_threads(paced_threads(selection_read, access_trace_realtime), trace_entries, concurrent_chunks)
+    elif concurrent_chunks == 1:
+        for chunk_index in dataset.shard_indices():
+            chunk_read(chunk_index)
+    else:
+        run_bounded_threads(chunk_read, dataset.shard_indices(), concurrent_chunks)
+
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
+    print(f"Decoded in {elapsed_ms:.2f}ms")
+    telemetry.emit()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import json
+import timeit
+import click
+
+from _telemetry import Telemetry
+from _stores import STORES
+from _scheduler import run_bounded_threads
+from _reference import DirectFiles, LocalFiles, MemoryFiles, ReferenceArray
+
+@click.command()
+@click.argument('path', type=str)
+@click.argument('output', type=str)
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset loaded into memory before timing to an in-memory output.')
+@click.option('--direct_io', is_flag=True, show_default=True, default=False, help='Read the filesystem store with O_DIRECT, bypassing the page cache (Linux, if the filesystem supports it). Writes are buffered. Ignored with --store memory.')
+@click.option('--concurrent_chunks', type=int, default=None, help='Number of threads copying chunks (shards if sharded). Defaults to that of ThreadPoolExecutor.')
+def main(path, output, store_type, direct_io, concurrent_chunks):
+    """A hand-rolled round trip: each chunk (or shard) is read, decoded, encoded and written with the same metadata from a pool of threads."""
+    telemetry = Telemetry()
+
+    if store_type == "memory":
+        files = MemoryFiles(path)
+        files_out = MemoryFiles()
+        telemetry.syscall_reads = False
+        telemetry.extra["memory_store_bytes"] = files.nbytes
+    else:
+        files = DirectFiles(path) if direct_io else LocalFiles(path)
+        files_out = LocalFiles(output)
+
+    dataset = ReferenceArray.open(files, path)
+    dataset_out = ReferenceArray(files_out, dataset.metadata)
+    files_out.set("zarr.json", json.dumps(dataset.metadata, indent=2).encode())
+
+    def chunk_copy(chunk_index):
+        start_time = timeit.default_timer()
+        chunk = dataset.read_shard(chunk_index)
+        telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+        dataset_out.write_shard(chunk_index, chunk)
+
+    telemetry.opened()
+    run_bounded_threads(chunk_copy, dataset.shard_indices(), concurrent_chunks)
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
+
+    print(f"Round trip in {elapsed_ms:.2f}ms")
+    telemetry.emit()
+
+if __name__ == "__main__":
+    main()
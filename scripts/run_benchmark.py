@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import click
+from _benchmarks import BENCHMARKS, scaled, with_access_traces
+from _run_benchmark import CACHE_EVICTION, load_runs, run_benchmark, summarise
+
+def parse_parameters(ctx, param, values):
+    parameters = {}
+    for value in values:
+        name, _, value = value.partition("=")
+        parameters.setdefault(name, []).append(value)
+    return parameters
+
+@click.command()
+@click.argument('benchmarks', type=click.Choice(list(BENCHMARKS)), nargs=-1, required=True)
+@click.option('--implementation', 'implementations', multiple=True, help='Only run these implementations. Can be repeated.')
+@click.option('--image', 'images', multiple=True, help='Only run these images. Can be repeated.')
+@click.option('--parameter', 'parameters', multiple=True, callback=parse_parameters, help='Only run these parameter values, e.g. concurrency=4. Can be repeated.')
+@click.option('--repetitions', type=int, default=None, help='Override the number of repetitions of each cell.')
+@click.option('--dry_run', is_flag=True, show_default=True, default=False, help='List the cells that would be run.')
+@click.option('--trace_interval', type=float, default=0.01, show_default=True, help='Interval (s) between /proc samples of the memory, CPU and I/O of each run. 0 disables tracing.')
+@click.option('--scale', type=float, default=None, help='Run on the datasets generated with generate_benchmark_array.py --all --scale SCALE data/scale_SCALE, recorded as BENCHMARK_scale_SCALE.')
+@click.option('--cache_eviction', type=click.Choice(CACHE_EVICTION), default='drop_caches', show_default=True, help='Before each run, drop the page cache of the whole system (needs passwordless sudo), evict only the files of the image with posix_fadvise (unprivileged), or do nothing.')
+@click.option('--access_trace', 'access_traces', multiple=True, help='Replay these access trace CSVs (e.g. captured from a service) instead of the generated traces of trace benchmarks. Can be repeated.')
+@click.option('--summarise_only', is_flag=True, show_default=True, default=False, help='Only rewrite the summary tables from the existing runs.')
+def main(benchmarks, implementations, images, parameters, repetitions, dry_run, trace_interval, scale, cache_eviction, access_traces, summarise_only):
+    """Run the cells of each BENCHMARK matrix, recording every run in measurements/benchmark_runs.csv."""
+    for benchmark in benchmarks:
+        benchmark = BENCHMARKS[benchmark] if scale is None else scaled(BENCHMARKS[benchmark], scale)
+        if access_traces:
+            benchmark = with_access_traces(benchmark, access_traces)
+        if summarise_only:
+            summarise(benchmark, load_runs())
+        else:
+            run_benchmark(benchmark, implementations, images, parameters, repetitions, dry_run, trace_interval, cache_eviction)
+
+if __name__ == "__main__":
+    main()
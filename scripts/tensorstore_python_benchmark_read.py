@@ -8,6 +8,13 @@ from functools import wraps
 
 import tensorstore as ts
 
+from _telemetry import Telemetry
+from _stores import STORES, evict_files, tensorstore_memory_kvstore
+from _buffers import TARGETS, allocate
+from _scheduler import run_bounded
+from _access_trace import paced, read_access_trace
+from _selections import parse_shape, random_boxes, random_planes, zipf_chunks, chunk_bytes_decoded
+
 def coro(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -18,14 +25,35 @@ def coro(f):
 @click.command()
 @coro
 @click.argument('path', type=str)
-@click.option('--concurrent_chunks', type=int, default=None, help='Number of concurrent async chunk reads. Ignored if --read-all is set')
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Read from the filesystem, or from a copy of the dataset loaded into memory before timing.')
+@click.option('--concurrent_chunks', type=int, default=None, help='Maximum number of concurrent async chunk (or --roi_shape box/--planes plane) reads, requested lazily. Defaults to 1024. Ignored if --read-all is set')
+@click.option('--inner_chunks', is_flag=True, show_default=True, default=False, help='Read the inner chunks of sharded arrays one by one, rather than whole shards.')
 @click.option('--read_all', is_flag=True, show_default=True, default=False, help='Read the entire array in one operation.')
-async def main(path, concurrent_chunks, read_all):
+@click.option('--read_into', type=click.Choice(TARGETS), default=None, help='With --read_all, decode into one preallocated numpy (or memory-mapped temporary file) array.')
+@click.option('--roi_shape', type=str, default=None, callback=parse_shape, help='Read --roi_count boxes of this shape (e.g. 100,100,100) at random unaligned offsets instead of chunks.')
+@click.option('--roi_count', type=int, default=100, show_default=True, help='Number of boxes read with --roi_shape.')
+@click.option('--planes', type=int, default=None, help='Read this many planes orthogonal to --plane_axis instead of chunks.')
+@click.option('--plane_axis', type=int, default=0, show_default=True, help='Axis of the --planes (0 for z-planes).')
+@click.option('--access_trace', type=str, default=None, help='Replay the box reads of an access trace CSV (see generate_access_trace.py) instead of chunks, clipped to the array.')
+@click.option('--access_trace_realtime', is_flag=True, show_default=True, default=False, help='Start each --access_trace read no earlier than its time offset, rather than as soon as a read is free.')
+@click.option('--zipf_accesses', type=int, default=None, help='Read this many chunks drawn from a Zipf distribution over the chunks (see --zipf_skew) instead of every chunk once.')
+@click.option('--zipf_skew', type=float, default=1.0, show_default=True, help='Skew of the --zipf_accesses chunk popularity, 0 for uniformly random.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the --roi_shape box offsets, --planes indices or --zipf_accesses chunks.')
+@click.option('--passes', type=int, default=1, show_default=True, help='Repeat the read (of everything, every chunk or every selection) this many times in one process.')
+@click.option('--evict_between_passes', is_flag=True, show_default=True, default=False, help='Evict the files of the filesystem store from the page cache (posix_fadvise) before every pass after the first.')
+@click.option('--cache_bytes', type=int, default=0, show_default=True, help='total_bytes_limit of the cache_pool of decoded chunks, 0 to disable.')
+async def main(path, store_type, concurrent_chunks, inner_chunks, read_all, read_into, roi_shape, roi_count, planes, plane_axis, access_trace, access_trace_realtime, zipf_accesses, zipf_skew, seed, passes, evict_between_passes, cache_bytes):
+    telemetry = Telemetry()
+    context = ts.Context({'cache_pool': {'total_bytes_limit': cache_bytes}})
+
     if path.startswith("http"):
         kvstore = {
             'driver': 'http',
             'base_url': path,
         }
+    elif store_type == "memory":
+        kvstore, telemetry.extra["memory_store_bytes"] = tensorstore_memory_kvstore(path, context)
+        telemetry.syscall_reads = False
     else:
         kvstore = {
             'driver': 'file',
@@ -35,18 +63,16 @@ async def main(path, concurrent_chunks, read_all):
     dataset_future = ts.open({
         'driver': 'zarr3',
         'kvstore': kvstore,
-        # 'context': {
-        #     'cache_pool': {
-        #         'total_bytes_limit': 100_000_000
-        #     }
-        # },
-        # 'recheck_cached_data': 'open',
-    })
+        # Cached chunks are not revalidated against the store after opening
+        **({'recheck_cached_data': 'open'} if cache_bytes else {}),
+    }, context=context)
     dataset = dataset_future.result()
     print(dataset)
 
     domain_shape = dataset.domain.shape
     chunk_shape = dataset.chunk_layout.write_chunk.shape # shard or chunk shape
+    if inner_chunks:
+        chunk_shape = dataset.chunk_layout.read_chunk.shape # inner chunk shape
 
     print("Domain shape", domain_shape)
     print("Chunk shape", chunk_shape)
@@ -54,35 +80,78 @@ async def main(path, concurrent_chunks, read_all):
     print("Number of chunks", num_chunks)
 
     async def chunk_read(chunk_index):
+        start_time = timeit.default_timer()
         chunk_slice = [ts.Dim(inclusive_min=index*cshape, exclusive_max=min(index * cshape + cshape, dshape)) for (index, cshape, dshape) in zip(chunk_index, chunk_shape, domain_shape)]
         # print("Reading", chunk_index)
-        return await dataset[ts.IndexDomain(chunk_slice)].read()
+        chunk = await dataset[ts.IndexDomain(chunk_slice)].read()
         # print("Read", chunk_index)
+        telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+        return chunk
 
-    start_time = timeit.default_timer()
-    if read_all:
-        print(dataset.read().result().shape)
-    elif concurrent_chunks is None:
-        async with asyncio.TaskGroup() as tg:
-            for chunk_index in np.ndindex(*num_chunks):
-                tg.create_task(chunk_read(chunk_index))
-    elif concurrent_chunks == 1:
-        for chunk_index in np.ndindex(*num_chunks):
-            chunk_slice = [ts.Dim(inclusive_min=index*cshape, exclusive_max=min(index * cshape + cshape, dshape)) for (index, cshape, dshape) in zip(chunk_index, chunk_shape, domain_shape)]
-            await dataset[ts.IndexDomain(chunk_slice)].read()
-    else:
-        # TODO: Not sure if this is the fastest API for this
-        semaphore = asyncio.Semaphore(concurrent_chunks)
-        async def chunk_read_concurrent_limit(chunk_index):
-            async with semaphore:
-                return await chunk_read(chunk_index)
-        async with asyncio.TaskGroup() as tg:
-            for chunk_index in np.ndindex(*num_chunks):
-                tg.create_task(chunk_read_concurrent_limit(chunk_index))
-
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    async def selection_read(selection):
+        start_time = timeit.default_timer()
+        data = await dataset[selection].read()
+        telemetry.selection_read(data.nbytes, timeit.default_timer() - start_time)
+        return data
+
+    selections = None
+    if access_trace is not None:
+        trace_entries = read_access_trace(access_trace, domain_shape)
+        selections = [selection for _, selection in trace_entries]
+    elif roi_shape is not None:
+        selections = random_boxes(domain_shape, roi_shape, roi_count, seed)
+    elif planes is not None:
+        selections = random_planes(domain_shape, plane_axis, planes, seed)
+    if selections is not None:
+        telemetry.extra["chunk_bytes_decoded"] = chunk_bytes_decoded(selections, dataset.chunk_layout.read_chunk.shape, dataset.dtype.numpy_dtype.itemsize)
+
+    # Every chunk once in order, or chunks drawn from a Zipf distribution
+    zipf_indices = None if zipf_accesses is None else zipf_chunks(num_chunks, zipf_accesses, zipf_skew, seed)
+
+    telemetry.opened()
+    for i in range(passes):
+        if i and evict_between_passes:
+            evict_files(path)
+        telemetry.start_pass()
+        if read_all and read_into is not None:
+            data = allocate(domain_shape, dataset.dtype.numpy_dtype, read_into)
+            # A tensorstore view of the preallocated array (not a copy) as the target of the read
+            await ts.array(data, copy=False).write(dataset)
+            telemetry.array_read(data.nbytes, np.prod(num_chunks).item())
+            telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+            print(data.shape)
+        elif read_all:
+            data = dataset.read().result()
+            telemetry.array_read(data.nbytes, np.prod(num_chunks).item())
+            telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+            print(data.shape)
+        elif access_trace is not None:
+            await run_bounded(paced(selection_read, access_trace_realtime), trace_entries, concurrent_chunks)
+        elif selections is not None:
+            await run_bounded(selection_read, selections, concurrent_chunks)
+        elif concurrent_chunks == 1:
+            for chunk_index in (np.ndindex(*num_chunks) if zipf_indices is None else zipf_indices):
+                start_time = timeit.default_timer()
+                chunk_slice = [ts.Dim(inclusive_min=index*cshape, exclusive_max=min(index * cshape + cshape, dshape)) for (index, cshape, dshape) in zip(chunk_index, chunk_shape, domain_shape)]
+                chunk = await dataset[ts.IndexDomain(chunk_slice)].read()
+                telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+        else:
+            # TODO: Not sure if this is the fastest API for this
+            await run_bounded(chunk_read, np.ndindex(*num_chunks) if zipf_indices is None else zipf_indices, concurrent_chunks)
+        telemetry.finish_pass()
+    telemetry.finished()
+    if cache_bytes:
+        metrics = {metric["name"].rpartition("/")[2]: metric["values"][0]["value"] for metric in ts.experimental_collect_matching_metrics("/tensorstore/cache/")}
+        telemetry.extra["cache_hits"] = metrics.get("hit_count", 0)
+        telemetry.extra["cache_misses"] = metrics.get("miss_count", 0)
+        requests = telemetry.extra["cache_hits"] + telemetry.extra["cache_misses"]
+        telemetry.extra["cache_hit_rate"] = telemetry.extra["cache_hits"] / requests if requests else None
+        # The cache_pool holds decoded read (inner) chunks
+        telemetry.extra["cache_entry_mb"] = np.prod(dataset.chunk_layout.read_chunk.shape).item() * dataset.dtype.numpy_dtype.itemsize / 1.0e6
+        print(f"Cache pool hits {telemetry.extra['cache_hits']}, misses {telemetry.extra['cache_misses']}")
+    elapsed_ms = telemetry.elapsed_s * 1000.0
     print(f"Decoded in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 
 import numpy as np
-import timeit
 import asyncio
 import click
 from functools import wraps
 import itertools
+import timeit
 import multiprocessing
 
 import tensorstore as ts
 
+from _telemetry import Telemetry
+from _stores import STORES, tensorstore_memory_kvstore
+from _scheduler import run_bounded
+
 def coro(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -21,7 +25,7 @@ def coro(f):
 # Via https://github.com/ome/ome2024-ngff-challenge/blob/main/src/ome2024_ngff_challenge/utils.py
 def chunk_iter(shape: list, chunks: list):
     """
-    Returns a series of tuples, each containing chunk slice
+    Returns a lazy series of tuples, each containing chunk slice
     E.g. for 2D shape/chunks: ((slice(0, 512, 1), slice(0, 512, 1)), (slice(0, 512, 1), slice(512, 1024, 1))...)
     Thanks to Davis Bennett.
     """
@@ -37,18 +41,27 @@ def chunk_iter(shape: list, chunks: list):
             for c_index in range(-(-dim_size // chunk_size))
         )
         chunk_iters.append(chunk_tuple)
-    return tuple(itertools.product(*chunk_iters))
+    return itertools.product(*chunk_iters)
 
 @click.command()
 @coro
 @click.argument('path', type=str)
 @click.argument('output', type=str)
-async def main(path, output):
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset loaded into memory before timing to an in-memory output.')
+@click.option('--pipelined', is_flag=True, show_default=True, default=False, help='Copy each write chunk with its own read and write futures in a sliding window, instead of in batched transactions.')
+@click.option('--in_flight', type=int, default=None, help='Number of --pipelined chunk copies in flight. Defaults to the number of CPUs.')
+async def main(path, output, store_type, pipelined, in_flight):
+    telemetry = Telemetry()
+    context = ts.Context()
+
     if path.startswith("http"):
         kvstore = {
             'driver': 'http',
             'base_url': path,
         }
+    elif store_type == "memory":
+        kvstore, telemetry.extra["memory_store_bytes"] = tensorstore_memory_kvstore(path, context)
+        telemetry.syscall_reads = False
     else:
         kvstore = {
             'driver': 'file',
@@ -64,12 +77,15 @@ async def main(path, output):
         #     }
         # },
         # 'recheck_cached_data': 'open',
-    })
+    }, context=context)
     dataset = dataset_future.result()
     # print(dataset)
 
     # Create a new dataset at the output path
     new_kvstore = {
+        'driver': 'memory',
+        'path': 'output/',
+    } if store_type == "memory" else {
         'driver': 'file',
         'path': output,
     }
@@ -80,10 +96,10 @@ async def main(path, output):
         'create': True,
         'delete_existing': True,
         'schema': dataset.schema,
-    })
+    }, context=context)
     new_dataset = new_dataset_future.result()
 
-    start_time = timeit.default_timer()
+    telemetry.opened()
 
     # new_dataset[:] = dataset[:] # NOPE!
 
@@ -91,15 +107,27 @@ async def main(path, output):
     # TODO: Not sure if this is the fastest API for this
     chunk_shape = dataset.chunk_layout.write_chunk.shape
     threads = multiprocessing.cpu_count()
-    for idx, batch in enumerate(itertools.batched(chunk_iter(new_dataset.shape, chunk_shape), threads)):
-        with ts.Transaction() as txn:
+    if pipelined:
+        # No barrier between batches, a chunk copy starts as soon as one finishes
+        async def copy_chunk(slice_tuple):
+            start_time = timeit.default_timer()
+            data = await dataset[slice_tuple].read()
+            telemetry.chunk_read(data.nbytes, timeit.default_timer() - start_time)
+            await new_dataset[slice_tuple].write(data)
+        await run_bounded(copy_chunk, chunk_iter(new_dataset.shape, chunk_shape), in_flight or threads)
+    else:
+        for idx, batch in enumerate(itertools.batched(chunk_iter(new_dataset.shape, chunk_shape), threads)):
+            with ts.Transaction() as txn:
+                for slice_tuple in batch:
+                    new_dataset.with_transaction(txn)[slice_tuple] = dataset[slice_tuple]
             for slice_tuple in batch:
-                new_dataset.with_transaction(txn)[slice_tuple] = dataset[slice_tuple]
+                telemetry.chunk_read(dataset[slice_tuple].size * dataset.dtype.numpy_dtype.itemsize)
 
 
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
     print(f"Decoded in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     asyncio.run(main())
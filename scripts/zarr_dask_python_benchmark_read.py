@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import math
 import timeit
 import click
 import sys
@@ -7,6 +8,16 @@ import zarr
 
 import dask
 import dask.array as da
+import numpy as np
+
+from _telemetry import Telemetry
+from _dask_callbacks import ChunkLatencyCallback
+from _stores import STORES, memory_store, memory_store_nbytes
+from _store_wrappers import MmapStore
+from _buffers import TARGETS, allocate
+from _scheduler import run_bounded_threads
+from _access_trace import paced_threads, read_access_trace
+from _selections import parse_shape, random_boxes, random_planes, chunk_bytes_decoded
 
 zarr.config.set({
     "async.concurrency": None,
@@ -14,17 +25,68 @@ zarr.config.set({
 
 @click.command()
 @click.argument('path', type=str)
-@click.option('--concurrent_chunks', type=int, default=None, help='Number of concurrent async chunk reads. Ignored if --read-all is set')
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Read from the filesystem, or from a copy of the dataset loaded into memory before timing.')
+@click.option('--mmap', 'use_mmap', is_flag=True, show_default=True, default=False, help='Read the filesystem store through memory-mapped files, rather than reading them into buffers. Ignored with --store memory.')
+@click.option('--concurrent_chunks', type=int, default=None, help='Number of concurrent async chunk (or --roi_shape box/--planes plane) reads. Ignored if --read-all is set')
 @click.option('--read_all', is_flag=True, show_default=True, default=False, help='Read the entire array in one operation.')
-def main(path, concurrent_chunks, read_all):
+@click.option('--read_into', type=click.Choice(TARGETS), default=None, help='With --read_all, decode into one preallocated numpy (or memory-mapped temporary file) array.')
+@click.option('--roi_shape', type=str, default=None, callback=parse_shape, help='Read --roi_count boxes of this shape (e.g. 100,100,100) at random unaligned offsets instead of chunks.')
+@click.option('--roi_count', type=int, default=100, show_default=True, help='Number of boxes read with --roi_shape.')
+@click.option('--planes', type=int, default=None, help='Read this many planes orthogonal to --plane_axis instead of chunks.')
+@click.option('--plane_axis', type=int, default=0, show_default=True, help='Axis of the --planes (0 for z-planes).')
+@click.option('--access_trace', type=str, default=None, help='Replay the box reads of an access trace CSV (see generate_access_trace.py) instead of chunks, clipped to the array.')
+@click.option('--access_trace_realtime', is_flag=True, show_default=True, default=False, help='Start each --access_trace read no earlier than its time offset, rather than as soon as a read is free.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the --roi_shape box offsets or --planes indices.')
+def main(path, store_type, use_mmap, concurrent_chunks, read_all, read_into, roi_shape, roi_count, planes, plane_axis, access_trace, access_trace_realtime, seed):
+    telemetry = Telemetry()
+
     # if "benchmark_compress_shard.zarr" in path:
     #     sys.exit(1)
-    z = zarr.open_array(path)
-    arr = da.from_zarr(path, chunks=z.shards)
+    if store_type == "memory":
+        z = zarr.open_array(store=memory_store(path), mode='r')
+        telemetry.extra["memory_store_bytes"] = memory_store_nbytes(z.store)
+        telemetry.syscall_reads = False
+    elif use_mmap:
+        z = zarr.open_array(store=MmapStore(path, read_only=True), mode='r')
+        telemetry.syscall_reads = False
+    else:
+        z = zarr.open_array(path)
+    arr = da.from_zarr(z if store_type == "memory" or use_mmap else path, chunks=z.shards)
+
+    def selection_read(selection):
+        # Each box is its own (synchronously scheduled) graph, so its latency can be measured
+        start_time = timeit.default_timer()
+        data = arr[selection].compute(scheduler='synchronous')
+        telemetry.selection_read(data.nbytes, timeit.default_timer() - start_time)
+
+    selections = None
+    if access_trace is not None:
+        trace_entries = read_access_trace(access_trace, arr.shape)
+        selections = [selection for _, selection in trace_entries]
+    elif roi_shape is not None:
+        selections = random_boxes(arr.shape, roi_shape, roi_count, seed)
+    elif planes is not None:
+        selections = random_planes(arr.shape, plane_axis, planes, seed)
+    if selections is not None:
+        telemetry.extra["chunk_bytes_decoded"] = chunk_bytes_decoded(selections, z.chunks, z.dtype.itemsize)
 
-    start_time = timeit.default_timer()
-    if read_all:
-        print(arr.compute().shape)
+    telemetry.opened()
+    if read_all and read_into is not None:
+        # Each block is stored into the preallocated array, rather than concatenated by compute()
+        data = allocate(arr.shape, arr.dtype, read_into)
+        da.store(arr, data, lock=False)
+        telemetry.array_read(data.nbytes, math.prod(arr.numblocks))
+        telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+        print(data.shape)
+    elif read_all:
+        data = arr.compute()
+        telemetry.array_read(data.nbytes, math.prod(arr.numblocks))
+        telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+        print(data.shape)
+    elif access_trace is not None:
+        run_bounded_threads(paced_threads(selection_read, access_trace_realtime), trace_entries, concurrent_chunks)
+    elif selections is not None:
+        run_bounded_threads(selection_read, selections, concurrent_chunks)
     else:
         if concurrent_chunks is not None:
             # _client = Client(threads_per_worker=concurrent_chunks, n_workers=1) # very high overhead
@@ -39,11 +101,13 @@ def main(path, concurrent_chunks, read_all):
         results = []
         for chunk in arr.to_delayed().ravel():
             results.append(read_chunk(chunk))
-        dask.compute(results)
+        with ChunkLatencyCallback(telemetry):
+            dask.compute(results)
 
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
     print(f"Decoded in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     main()
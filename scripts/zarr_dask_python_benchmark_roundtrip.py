@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 
-import timeit
+import math
 import click
 import sys
 import zarr
+from zarr.storage import MemoryStore
 
 import dask.array as da
 
+from _telemetry import Telemetry
+from _stores import STORES, memory_store, memory_store_nbytes
+
 zarr.config.set({
     "async.concurrency": None,
 })
@@ -14,18 +18,28 @@ zarr.config.set({
 @click.command()
 @click.argument('path', type=str)
 @click.argument('output', type=str)
-def main(path, output):
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset loaded into memory before timing to an in-memory output.')
+def main(path, output, store_type):
+    telemetry = Telemetry()
+
     # if "benchmark_compress_shard.zarr" in path:
     #     sys.exit(1)
-    z = zarr.open_array(path)
+    if store_type == "memory":
+        z = zarr.open_array(store=memory_store(path), mode='r')
+        telemetry.extra["memory_store_bytes"] = memory_store_nbytes(z.store)
+        telemetry.syscall_reads = False
+    else:
+        z = zarr.open_array(path)
 
-    arr = da.from_zarr(path, chunks=z.shards)
-    start_time = timeit.default_timer()
-    da.to_zarr(arr, output)
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    arr = da.from_zarr(z if store_type == "memory" else path, chunks=z.shards)
+    telemetry.opened()
+    da.to_zarr(arr, MemoryStore() if store_type == "memory" else output)
+    telemetry.array_read(arr.nbytes, math.prod(arr.numblocks))
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
 
     print(f"Round trip in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     main()
@@ -1,17 +1,20 @@
 #!/usr/bin/env python3
 
 import numpy as np
-import timeit
 import asyncio
 import click
 from functools import wraps
 import sys
 
 import zarr
-from zarr.storage import LocalStore, FsspecStore
+from zarr.storage import LocalStore, FsspecStore, MemoryStore
 from zarr.core.indexing import BlockIndexer
 from zarr.core.buffer import default_buffer_prototype
 
+from _telemetry import Telemetry
+from _stores import STORES, memory_store, memory_store_nbytes
+from _streaming import stream_copy
+
 zarr.config.set({
     "async.concurrency": 10, # None is too much memory
 })
@@ -27,22 +30,37 @@ def coro(f):
 @coro
 @click.argument('path', type=str)
 @click.argument('output', type=str)
-async def main(path, output):
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset loaded into memory before timing to an in-memory output.')
+@click.option('--shards_in_flight', type=int, default=None, help='Stream the copy shard by shard (chunk by chunk if unsharded) with this many shards in flight, instead of reading the whole array then writing it.')
+@click.option('--memory_budget_gb', type=float, default=None, help='Limit --shards_in_flight so the decoded shards in flight fit within this budget.')
+async def main(path, output, store_type, shards_in_flight, memory_budget_gb):
+    telemetry = Telemetry()
+
     # if "benchmark_compress_shard.zarr" in path:
     #     sys.exit(1)
 
     if path.startswith("http"):
         store = FsspecStore.from_url(url=path) # broken with zarr-python 3.0.0a0
+    elif store_type == "memory":
+        store = memory_store(path)
+        telemetry.extra["memory_store_bytes"] = memory_store_nbytes(store)
+        telemetry.syscall_reads = False
     else:
         store = LocalStore(path, read_only=True)
 
     dataset = zarr.open(store=store, mode='r')
-    dataset_out = zarr.create(store=LocalStore(output), mode='w', shape=dataset.shape, chunks=dataset.chunks, dtype=dataset.dtype, codecs=dataset.metadata.codecs)
+    dataset_out = zarr.create(store=MemoryStore() if store_type == "memory" else LocalStore(output), mode='w', shape=dataset.shape, chunks=dataset.metadata.chunk_grid.chunk_shape, dtype=dataset.dtype, codecs=dataset.metadata.codecs)
 
-    start_time = timeit.default_timer()
+    telemetry.opened()
 
-    # Simple
-    dataset_out[:] = dataset[:] # TODO: Faster approach? Chunk-by-chunk with concurrency?
+    if shards_in_flight is not None:
+        # Streaming
+        await stream_copy(dataset, dataset_out, shards_in_flight, memory_budget_gb, telemetry)
+    else:
+        # Simple
+        data = dataset[:]
+        telemetry.array_read(data.nbytes, dataset.metadata.chunk_grid.get_nchunks(dataset.shape))
+        dataset_out[:] = data # TODO: Faster approach? Chunk-by-chunk with concurrency?
 
     # # Chunk by chunk
     # domain_shape = dataset.shape
@@ -57,10 +75,11 @@ async def main(path, output):
     #     print(chunk_index)
     #     dataset_out.set_block_selection(chunk_index, dataset.get_block_selection(chunk_index))
 
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
 
     print(f"Round trip in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 
-import timeit
+import math
 import click
+import os
 import sys
 
 import dask.array as da
 
+from _telemetry import Telemetry
+from _stores import STORES, directory_nbytes, tmpfs_copy
+
 import zarr
 
 import zarrs
@@ -25,17 +29,26 @@ zarr.config.set({
 @click.command()
 @click.argument('path', type=str)
 @click.argument('output', type=str)
-def main(path, output):
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset made on tmpfs before timing (zarrs-python does not support MemoryStore) to an in-memory output.')
+def main(path, output, store_type):
+    telemetry = Telemetry()
+
     # if "benchmark_compress_shard.zarr" in path:
     #     sys.exit(1)
+    if store_type == "memory":
+        copy = tmpfs_copy(path)
+        path = os.path.join(copy.name, "array")
+        telemetry.extra["memory_store_bytes"] = directory_nbytes(path)
     z = zarr.open_array(path)
     arr = da.from_zarr(path, chunks=z.shards)
-    start_time = timeit.default_timer()
-    da.to_zarr(arr, output)
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    telemetry.opened()
+    da.to_zarr(arr, os.path.join(copy.name, "output") if store_type == "memory" else output)
+    telemetry.array_read(arr.nbytes, math.prod(arr.numblocks))
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
 
     print(f"Round trip in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     main()
@@ -4,6 +4,7 @@ import numpy as np
 import timeit
 import asyncio
 import click
+import os
 from functools import wraps
 import sys
 
@@ -12,6 +13,14 @@ from zarr.storage import LocalStore, FsspecStore
 from zarr.core.indexing import BlockIndexer
 from zarr.core.buffer import default_buffer_prototype
 
+from _telemetry import Telemetry
+from _stores import STORES, directory_nbytes, evict_files, tmpfs_copy
+from _buffers import TARGETS, allocate
+from _scheduler import run_bounded
+from _chunk_cache import CachingCodecPipeline
+from _access_trace import paced, read_access_trace
+from _selections import parse_shape, random_boxes, random_planes, zipf_chunks, chunk_bytes_decoded
+
 import zarrs
 zarr.config.set({
     "threading.num_workers": None,
@@ -37,21 +46,44 @@ def coro(f):
 @click.command()
 @coro
 @click.argument('path', type=str)
-@click.option('--concurrent_chunks', type=int, default=None, help='Number of concurrent async chunk reads. Ignored if --read-all is set')
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Read from the filesystem, or from a copy of the dataset made on tmpfs before timing (zarrs-python does not support MemoryStore).')
+@click.option('--concurrent_chunks', type=int, default=None, help='Maximum number of concurrent async chunk (or --roi_shape box/--planes plane) reads, requested lazily. Defaults to 1024. Ignored if --read-all is set')
+@click.option('--inner_chunks', is_flag=True, show_default=True, default=False, help='Read the inner chunks of sharded arrays one by one, rather than whole shards.')
 @click.option('--read_all', is_flag=True, show_default=True, default=False, help='Read the entire array in one operation.')
-async def main(path, concurrent_chunks, read_all):
+@click.option('--read_into', type=click.Choice(TARGETS), default=None, help='With --read_all, decode into one preallocated numpy (or memory-mapped temporary file) array.')
+@click.option('--roi_shape', type=str, default=None, callback=parse_shape, help='Read --roi_count boxes of this shape (e.g. 100,100,100) at random unaligned offsets instead of chunks.')
+@click.option('--roi_count', type=int, default=100, show_default=True, help='Number of boxes read with --roi_shape.')
+@click.option('--planes', type=int, default=None, help='Read this many planes orthogonal to --plane_axis instead of chunks.')
+@click.option('--plane_axis', type=int, default=0, show_default=True, help='Axis of the --planes (0 for z-planes).')
+@click.option('--access_trace', type=str, default=None, help='Replay the box reads of an access trace CSV (see generate_access_trace.py) instead of chunks, clipped to the array.')
+@click.option('--access_trace_realtime', is_flag=True, show_default=True, default=False, help='Start each --access_trace read no earlier than its time offset, rather than as soon as a read is free.')
+@click.option('--zipf_accesses', type=int, default=None, help='Read this many chunks drawn from a Zipf distribution over the chunks (see --zipf_skew) instead of every chunk once.')
+@click.option('--zipf_skew', type=float, default=1.0, show_default=True, help='Skew of the --zipf_accesses chunk popularity, 0 for uniformly random.')
+@click.option('--seed', type=int, default=0, show_default=True, help='Seed of the --roi_shape box offsets, --planes indices or --zipf_accesses chunks.')
+@click.option('--passes', type=int, default=1, show_default=True, help='Repeat the read (of everything, every chunk or every selection) this many times in one process.')
+@click.option('--evict_between_passes', is_flag=True, show_default=True, default=False, help='Evict the files of the filesystem store from the page cache (posix_fadvise) before every pass after the first.')
+@click.option('--cache_bytes', type=int, default=0, show_default=True, help='Byte budget of an LRU cache of decoded chunks (shards if sharded) wrapping the codec pipeline, 0 to disable.')
+async def main(path, store_type, concurrent_chunks, inner_chunks, read_all, read_into, roi_shape, roi_count, planes, plane_axis, access_trace, access_trace_realtime, zipf_accesses, zipf_skew, seed, passes, evict_between_passes, cache_bytes):
+    telemetry = Telemetry()
+
     # if "benchmark_compress_shard.zarr" in path:
     #     sys.exit(1)
 
     if path.startswith("http"):
         store = FsspecStore.from_url(url=path) # broken with zarr-python 3.0.0a0
+    elif store_type == "memory":
+        copy = tmpfs_copy(path)
+        store = LocalStore(os.path.join(copy.name, "array"), read_only=True)
+        telemetry.extra["memory_store_bytes"] = directory_nbytes(store.root)
     else:
         store = LocalStore(path, read_only=True)
 
     dataset = zarr.open(store=store, mode='r')
+    if cache_bytes:
+        cached_pipeline = CachingCodecPipeline.wrap(dataset, cache_bytes)
 
     domain_shape = dataset.shape
-    chunk_shape = dataset.shards or dataset.chunks
+    chunk_shape = dataset.chunks if inner_chunks else (dataset.shards or dataset.chunks)
 
     print("Domain shape", domain_shape)
     print("Chunk shape", chunk_shape)
@@ -59,33 +91,72 @@ async def main(path, concurrent_chunks, read_all):
     print("Number of chunks", num_chunks)
 
     async def chunk_read(chunk_index):
-        indexer = BlockIndexer(chunk_index, dataset.shape, dataset.metadata.chunk_grid)
-        return await dataset._async_array._get_selection(
-            indexer=indexer, prototype=default_buffer_prototype()
-        )
-
-    start_time = timeit.default_timer()
-    if read_all:
-        print(dataset[:].shape)
-    elif concurrent_chunks is None:
-        async with asyncio.TaskGroup() as tg:
-            for chunk_index in np.ndindex(*num_chunks):
-                tg.create_task(chunk_read(chunk_index))
-    elif concurrent_chunks == 1:
-        for chunk_index in np.ndindex(*num_chunks):
-            dataset[tuple(slice(i * s, (1 + i) * s) for i, s in zip(chunk_index, chunk_shape))]
-    else:
-        semaphore = asyncio.Semaphore(concurrent_chunks)
-        async def chunk_read_concurrent_limit(chunk_index):
-            async with semaphore:
-                return await chunk_read(chunk_index)
-        async with asyncio.TaskGroup() as tg:
-            for chunk_index in np.ndindex(*num_chunks):
-                tg.create_task(chunk_read_concurrent_limit(chunk_index))
-
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+        start_time = timeit.default_timer()
+        if inner_chunks:
+            chunk = await dataset._async_array.getitem(tuple(slice(i * s, min((i + 1) * s, d)) for i, s, d in zip(chunk_index, chunk_shape, domain_shape)))
+        else:
+            indexer = BlockIndexer(chunk_index, dataset.shape, dataset.metadata.chunk_grid)
+            chunk = await dataset._async_array._get_selection(
+                indexer=indexer, prototype=default_buffer_prototype()
+            )
+        telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+        return chunk
+
+    async def selection_read(selection):
+        start_time = timeit.default_timer()
+        data = await dataset._async_array.getitem(selection)
+        telemetry.selection_read(data.nbytes, timeit.default_timer() - start_time)
+        return data
+
+    selections = None
+    if access_trace is not None:
+        trace_entries = read_access_trace(access_trace, domain_shape)
+        selections = [selection for _, selection in trace_entries]
+    elif roi_shape is not None:
+        selections = random_boxes(domain_shape, roi_shape, roi_count, seed)
+    elif planes is not None:
+        selections = random_planes(domain_shape, plane_axis, planes, seed)
+    if selections is not None:
+        telemetry.extra["chunk_bytes_decoded"] = chunk_bytes_decoded(selections, dataset.chunks, dataset.dtype.itemsize)
+
+    # Every chunk once in order, or chunks drawn from a Zipf distribution
+    zipf_indices = None if zipf_accesses is None else zipf_chunks(num_chunks, zipf_accesses, zipf_skew, seed)
+
+    telemetry.opened()
+    for i in range(passes):
+        if i and evict_between_passes:
+            evict_files(path)
+        telemetry.start_pass()
+        if read_all and read_into is not None:
+            data = allocate(domain_shape, dataset.dtype, read_into)
+            dataset.get_basic_selection(..., out=default_buffer_prototype().nd_buffer.from_numpy_array(data))
+            telemetry.array_read(data.nbytes, np.prod(num_chunks).item())
+            telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+            print(data.shape)
+        elif read_all:
+            data = dataset[:]
+            telemetry.array_read(data.nbytes, np.prod(num_chunks).item())
+            telemetry.extra["ideal_memory_gb"] = data.nbytes / 1.0e9
+            print(data.shape)
+        elif access_trace is not None:
+            await run_bounded(paced(selection_read, access_trace_realtime), trace_entries, concurrent_chunks)
+        elif selections is not None:
+            await run_bounded(selection_read, selections, concurrent_chunks)
+        elif concurrent_chunks == 1:
+            for chunk_index in (np.ndindex(*num_chunks) if zipf_indices is None else zipf_indices):
+                start_time = timeit.default_timer()
+                chunk = dataset[tuple(slice(i * s, (1 + i) * s) for i, s in zip(chunk_index, chunk_shape))]
+                telemetry.chunk_read(chunk.nbytes, timeit.default_timer() - start_time)
+        else:
+            await run_bounded(chunk_read, np.ndindex(*num_chunks) if zipf_indices is None else zipf_indices, concurrent_chunks)
+        telemetry.finish_pass()
+    telemetry.finished()
+    if cache_bytes:
+        telemetry.extra.update(cached_pipeline.stats())
+        print("Decoded chunk cache", cached_pipeline.stats())
+    elapsed_ms = telemetry.elapsed_s * 1000.0
     print(f"Decoded in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,11 +1,16 @@
 #!/usr/bin/env python3
 
-import timeit
+import asyncio
 import click
+import os
 
 import zarr
 from zarr.storage import LocalStore, FsspecStore
 
+from _telemetry import Telemetry
+from _stores import STORES, directory_nbytes, tmpfs_copy
+from _streaming import stream_copy
+
 import zarrs
 zarr.config.set({
     "threading.num_workers": None,
@@ -23,23 +28,38 @@ zarr.config.set({
 @click.command()
 @click.argument('path', type=str)
 @click.argument('output', type=str)
-def main(path, output):
+@click.option('--store', 'store_type', type=click.Choice(STORES), default='local', show_default=True, help='Round trip on the filesystem, or from a copy of the dataset made on tmpfs before timing (zarrs-python does not support MemoryStore) to an in-memory output.')
+@click.option('--shards_in_flight', type=int, default=None, help='Stream the copy shard by shard (chunk by chunk if unsharded) with this many shards in flight, instead of reading the whole array then writing it.')
+@click.option('--memory_budget_gb', type=float, default=None, help='Limit --shards_in_flight so the decoded shards in flight fit within this budget.')
+def main(path, output, store_type, shards_in_flight, memory_budget_gb):
+    telemetry = Telemetry()
+
     if path.startswith("http"):
         store = FsspecStore.from_url(url=path) # broken with zarr-python 3.0.0a0
+    elif store_type == "memory":
+        copy = tmpfs_copy(path)
+        store = LocalStore(os.path.join(copy.name, "array"), read_only=True)
+        telemetry.extra["memory_store_bytes"] = directory_nbytes(store.root)
     else:
         store = LocalStore(path, read_only=True)
 
     dataset = zarr.open(store=store, mode='r')
-    dataset_out = zarr.create(store=LocalStore(output), mode='w', shape=dataset.shape, chunks=dataset.chunks, dtype=dataset.dtype, codecs=dataset.metadata.codecs)
+    dataset_out = zarr.create(store=LocalStore(os.path.join(copy.name, "output") if store_type == "memory" else output), mode='w', shape=dataset.shape, chunks=dataset.metadata.chunk_grid.chunk_shape, dtype=dataset.dtype, codecs=dataset.metadata.codecs)
 
-    start_time = timeit.default_timer()
+    telemetry.opened()
 
-    dataset_out[:] = dataset[:]
+    if shards_in_flight is not None:
+        asyncio.run(stream_copy(dataset, dataset_out, shards_in_flight, memory_budget_gb, telemetry))
+    else:
+        data = dataset[:]
+        telemetry.array_read(data.nbytes, dataset.metadata.chunk_grid.get_nchunks(dataset.shape))
+        dataset_out[:] = data
 
-    elapsed = timeit.default_timer() - start_time
-    elapsed_ms = elapsed * 1000.0
+    telemetry.finished()
+    elapsed_ms = telemetry.elapsed_s * 1000.0
 
     print(f"Round trip in {elapsed_ms:.2f}ms")
+    telemetry.emit()
 
 if __name__ == "__main__":
     main()